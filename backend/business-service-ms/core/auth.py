@@ -1,14 +1,113 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 from functools import wraps
 from django.http import JsonResponse
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.tokens import Token
 from security.models import CompanyBranch, Role
+from core.session_cache import SessionCache
 import jwt
 from django.contrib.auth.models import User
 
+
+class ValidationCache:
+    """
+    Process-local cache of the authentication of tokens already validated, keyed by the
+    sha256 of the raw token: only the exact token core accepted (or whose signature was
+    verified) hits, never a forged one that reuses its jti. Entries live
+    CORE_VALIDATION_CACHE_TTL seconds and never past the token expiry.
+    """
+    MAX_ENTRIES = 10000
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def get(cls, key):
+        if not key:
+            return None
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del cls._entries[key]
+                return None
+            cls._entries.move_to_end(key)
+            return value
+
+    @classmethod
+    def set(cls, key, value, token_exp=None):
+        ttl = settings.CORE_VALIDATION_CACHE_TTL
+        if token_exp:
+            ttl = min(ttl, token_exp - time.time())
+        if not key or ttl <= 0:
+            return
+        with cls._lock:
+            cls._entries[key] = (time.monotonic() + ttl, value)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def delete(cls, key):
+        with cls._lock:
+            cls._entries.pop(key, None)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+
 class CoreServiceClient:
+    VALIDATE_PATH = '/api/v1.0.0/session/validate/'
+    _session = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def session(cls):
+        """Keep-alive HTTP session to core, shared by the threads of this process"""
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    session = requests.Session()
+                    # Only connection errors are retried: the request never reached core
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=settings.CORE_SERVICE_POOL_SIZE,
+                        max_retries=Retry(total=2, read=0, status=0, allowed_methods=False, backoff_factor=0.05)
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    cls._session = session
+        return cls._session
+
+    @classmethod
+    def request(cls, method, path, **kwargs):
+        """Request to core through the pooled session, with the configured timeouts"""
+        kwargs.setdefault('timeout', settings.CORE_SERVICE_TIMEOUT)
+        return cls.session().request(method, f"{settings.CORE_SERVICE_URL}{path}", **kwargs)
+
+    @classmethod
+    def validate_token(cls, token):
+        """User data of the token according to core, or None if core rejects it"""
+        response = cls.request('POST', cls.VALIDATE_PATH, headers={'Authorization': f'Bearer {token}'})
+        if response.status_code != 200:
+            return None
+        return response.json().get('data', {})
+
     @staticmethod
     def get_or_create_user(user_data):
         """Get or create a local user based on core service data"""
@@ -30,8 +129,9 @@ class CoreServiceClient:
     def sync_branch_data(branch_id):
         """Sync branch data from core service"""
         try:
-            response = requests.get(
-                f"{settings.CORE_SERVICE_URL}/api/v1.0.0/security/branch/{branch_id}/",
+            response = CoreServiceClient.request(
+                'GET',
+                f"/api/v1.0.0/security/branch/{branch_id}/",
                 headers={'Authorization': f'Bearer {settings.CORE_SERVICE_TOKEN}'}
             )
             if response.status_code == 200:
@@ -49,8 +149,9 @@ class CoreServiceClient:
     def sync_role_data(role_id):
         """Sync role data from core service"""
         try:
-            response = requests.get(
-                f"{settings.CORE_SERVICE_URL}/api/v1.0.0/security/role/{role_id}/",
+            response = CoreServiceClient.request(
+                'GET',
+                f"/api/v1.0.0/security/role/{role_id}/",
                 headers={'Authorization': f'Bearer {settings.CORE_SERVICE_TOKEN}'}
             )
             if response.status_code == 200:
@@ -72,47 +173,106 @@ class CustomJWTAuthentication(JWTAuthentication):
                 return None
 
             token = auth_header.split(' ')[1]
-            
-            # Validate token with core service
-            response = requests.post(
-                f"{settings.CORE_SERVICE_URL}/api/v1.0.0/session/validate/",
-                headers={'Authorization': f'Bearer {token}'}
-            )
-            
-            if response.status_code != 200:
-                return None
+            cache_key = ValidationCache.key(token)
 
-            # Decode token to get claims
-            token_data = jwt.decode(token, options={"verify_signature": False})
-            user_data = response.json().get('data', {})
-            
-            # Get or create local user
-            user = CoreServiceClient.get_or_create_user(user_data)
-            if not user:
-                return None
+            # Decode token to get claims. Without local verification they are unverified
+            # until core validates this exact token (or it is found in ValidationCache)
+            if self.verifies_locally():
+                token_data = self._verify_locally(token)
+            else:
+                token_data = jwt.decode(token, options={"verify_signature": False})
+            jti = token_data.get('jti')
 
-            # Set branch and role information
-            request.branch = None
-            request.role = None
-            
-            branch_id = token_data.get('branch_id')
-            role_id = token_data.get('role_id')
+            revoked = False
+            if self.verifies_locally():
+                # Logout in core revokes the token before it expires. In the default mode core's
+                # session/validate/ rejects it, at most CORE_VALIDATION_CACHE_TTL later
+                revoked = self._is_revoked(jti)
+                if revoked:
+                    ValidationCache.delete(cache_key)
+                    return None
 
-            if branch_id:
-                request.branch = CompanyBranch.objects.filter(id=branch_id).first()
-                if not request.branch:
-                    request.branch = CoreServiceClient.sync_branch_data(branch_id)
+            # The same token validated a moment ago skips the network hop; when Redis could not
+            # say whether it was revoked, core decides
+            cached = ValidationCache.get(cache_key) if revoked is False else None
+            if cached is None:
+                user_data = None
+                if revoked is False and self.verifies_locally():
+                    # The signature is already verified: user data from the core session in Redis
+                    session_data = self._get_session(jti)
+                    user_data = session_data.get('user') if session_data else None
+                if user_data is None:
+                    # Validate token with core service
+                    user_data = CoreServiceClient.validate_token(token)
+                if user_data is None:
+                    return None
 
-            if role_id:
-                request.role = Role.objects.filter(id=role_id).first()
-                if not request.role:
-                    request.role = CoreServiceClient.sync_role_data(role_id)
+                # Get or create local user
+                user = CoreServiceClient.get_or_create_user(user_data)
+                if not user:
+                    return None
 
+                cached = (
+                    user,
+                    self._get_branch(token_data.get('branch_id')),
+                    self._get_role(token_data.get('role_id')),
+                    token_data
+                )
+                ValidationCache.set(cache_key, cached, token_data.get('exp'))
+
+            # Set branch and role information; the claims are those of the validated token
+            user, request.branch, request.role, token_data = cached
             return (user, token_data)
-            
+
         except Exception as e:
             return None
 
+    @staticmethod
+    def verifies_locally():
+        return settings.CORE_JWT_LOCAL_VERIFY and bool(settings.CORE_JWT_SIGNING_KEY)
+
+    @staticmethod
+    def _verify_locally(token):
+        """Claims of an access token signed with core's key; raises jwt.InvalidTokenError otherwise"""
+        token_data = jwt.decode(
+            token,
+            settings.CORE_JWT_SIGNING_KEY,
+            algorithms=[settings.CORE_JWT_ALGORITHM],
+            leeway=settings.CORE_JWT_LEEWAY,
+            options={'require': ['exp', 'jti']}
+        )
+        if token_data.get('token_type', 'access') != 'access':
+            raise jwt.InvalidTokenError('Not an access token')
+        return token_data
+
+    @staticmethod
+    def _is_revoked(jti):
+        """Whether core revoked the token, or None if Redis cannot be read"""
+        try:
+            return SessionCache.is_revoked(jti)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _get_session(jti):
+        """Core session of the token from Redis, or None if missing or Redis cannot be read"""
+        try:
+            return SessionCache.get_session(jti)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _get_branch(branch_id):
+        if not branch_id:
+            return None
+        return CompanyBranch.objects.filter(id=branch_id).first() or CoreServiceClient.sync_branch_data(branch_id)
+
+    @staticmethod
+    def _get_role(role_id):
+        if not role_id:
+            return None
+        return Role.objects.filter(id=role_id).first() or CoreServiceClient.sync_role_data(role_id)
+
 def jwt_required(view_func):
     """Decorator to use CustomJWTAuthentication"""
     @wraps(view_func)
@@ -4,22 +4,34 @@ import json
 class SessionCache:
     PREFIX = 'session:'
     TOKEN_PREFIX = 'token:'
-    
+    REVOKED_PREFIX = 'revoked:'
+
     @classmethod
     def get_session(cls, token_jti):
         """
         Get session data by token JTI
         """
-        token_key = f"{cls.TOKEN_PREFIX}{token_jti}"
-        session_id = cache.get(token_key)
-        
-        if not session_id:
-            return None
-            
-        session_key = f"{cls.PREFIX}{session_id}"
-        session_data = cache.get(session_key)
-        
+        # core keys sessions by JTI; the token key only exists for older sessions
+        session_data = cache.get(f"{cls.PREFIX}{token_jti}")
+
+        if not session_data:
+            token_key = f"{cls.TOKEN_PREFIX}{token_jti}"
+            session_id = cache.get(token_key)
+
+            if not session_id:
+                return None
+
+            session_key = f"{cls.PREFIX}{session_id}"
+            session_data = cache.get(session_key)
+
         if not session_data:
             return None
-            
-        return json.loads(session_data)
\ No newline at end of file
+
+        return json.loads(session_data) if isinstance(session_data, (str, bytes)) else session_data
+
+    @classmethod
+    def is_revoked(cls, token_jti):
+        """
+        Whether core revoked the token (logout); entries expire with the token
+        """
+        return bool(token_jti) and cache.get(f"{cls.REVOKED_PREFIX}{token_jti}") is not None
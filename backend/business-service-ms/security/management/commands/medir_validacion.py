@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import jwt
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from core.auth import CoreServiceClient, CustomJWTAuthentication, ValidationCache
+
+
+class _CoreStub(BaseHTTPRequestHandler):
+    """Minimal stand-in for core's session/validate/ endpoint, with keep-alive"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    latency = 0
+
+    def do_POST(self):
+        if self.latency:
+            time.sleep(self.latency)
+        body = json.dumps({'data': {'username': 'medicion', 'email': 'medicion@example.com'}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la autenticación de tokens contra un core local simulado: requests.post por petición '
+        'y CustomJWTAuthentication.authenticate sin caché, con caché de validación y con verificación '
+        'local (que lee la revocación del Redis configurado)'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=500)
+        parser.add_argument('--latencia-ms', type=float, default=0, help='Latencia simulada del core')
+
+    def handle(self, *args, **options):
+        _CoreStub.latency = options['latencia_ms'] / 1000
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _CoreStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        signing_key = uuid.uuid4().hex
+        token_data = {'jti': uuid.uuid4().hex, 'exp': int(time.time()) + 3600, 'token_type': 'access'}
+        token = jwt.encode(token_data, signing_key, algorithm='HS256')
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        authentication = CustomJWTAuthentication()
+        iterations = options['iteraciones']
+
+        def sin_pool():
+            requests.post(
+                f"{url}{CoreServiceClient.VALIDATE_PATH}",
+                headers={'Authorization': f'Bearer {token}'}
+            ).json()
+
+        def autenticar():
+            if authentication.authenticate(request) is None:
+                raise CommandError('El token de medición no fue aceptado')
+
+        modos = (
+            ('requests.post sin pool', sin_pool, {}),
+            ('authenticate sin caché', autenticar, {'CORE_VALIDATION_CACHE_TTL': 0}),
+            ('authenticate con caché', autenticar, {}),
+            ('authenticate local', autenticar, {
+                'CORE_JWT_LOCAL_VERIFY': True,
+                'CORE_JWT_SIGNING_KEY': signing_key,
+                'CORE_JWT_ALGORITHM': 'HS256',
+            }),
+        )
+
+        try:
+            for name, function, overrides in modos:
+                with override_settings(CORE_SERVICE_URL=url, **overrides):
+                    ValidationCache.clear()
+                    function()
+                    start = time.perf_counter()
+                    for _ in range(iterations):
+                        function()
+                    elapsed = (time.perf_counter() - start) * 1000
+                    self.stdout.write(f"{name:<25}{elapsed / iterations:>10.3f} ms/validación")
+        finally:
+            server.shutdown()
+            ValidationCache.clear()
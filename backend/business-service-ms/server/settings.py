@@ -102,6 +102,22 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 # Core Service settings
 CORE_SERVICE_URL = os.getenv('CORE_SERVICE_URL', 'http://localhost:8000')
+# Timeouts (connect, read) in seconds and keep-alive pool size of the HTTP client to core
+CORE_SERVICE_TIMEOUT = (
+    float(os.getenv('CORE_SERVICE_CONNECT_TIMEOUT', '2')),
+    float(os.getenv('CORE_SERVICE_READ_TIMEOUT', '5')),
+)
+CORE_SERVICE_POOL_SIZE = int(os.getenv('CORE_SERVICE_POOL_SIZE', '20'))
+# Seconds a token validated by core is trusted without asking again (0 disables the cache)
+CORE_VALIDATION_CACHE_TTL = int(os.getenv('CORE_VALIDATION_CACHE_TTL', '30'))
+# Opt-in: verify the JWT signature here with core's signing key instead of asking core.
+# Revoked tokens are read from the Redis shared with core; user data comes from the core
+# session in Redis and core is only called when it is missing or Redis cannot be read.
+# The default mode does not use Redis: core rejects revoked tokens on validation.
+CORE_JWT_LOCAL_VERIFY = os.getenv('CORE_JWT_LOCAL_VERIFY', 'False').lower() == 'true'
+CORE_JWT_SIGNING_KEY = os.getenv('CORE_JWT_SIGNING_KEY', '')
+CORE_JWT_ALGORITHM = os.getenv('CORE_JWT_ALGORITHM', 'HS256')
+CORE_JWT_LEEWAY = int(os.getenv('CORE_JWT_LEEWAY', '0'))
 
 # Redis Cache Configuration
 CACHES = {
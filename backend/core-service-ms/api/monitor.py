@@ -0,0 +1,17 @@
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
+from rest_framework import status
+from core.my_cache import MyLocalCache
+from helpers.response_helper import HelperResponse
+
+
+class CacheStatsView(APIView):
+    """Contadores del cache local (L1) del proceso que atiende el request"""
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        response = HelperResponse()
+        response.set_success(is_success=True)
+        response.set_status(code=status.HTTP_200_OK)
+        response.set_data(data={'cache_l1': MyLocalCache.stats()})
+        return response.to_dict()
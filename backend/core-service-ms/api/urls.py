@@ -4,6 +4,7 @@ from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
 from api.version import VersionView
+from api.monitor import CacheStatsView
 
 schema_view_v1_0_0 = get_schema_view(
     openapi.Info(
@@ -26,5 +27,6 @@ api_version_views = [
 urlpatterns = [
     re_path(r'^swagger/v1.0.0/$', schema_view_v1_0_0.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui-v1_0_0'),
     re_path('version/', VersionView.as_view(), name='api-version'),
+    re_path(r'^monitor/cache/$', CacheStatsView.as_view(), name='api-monitor-cache'),
     re_path(r'^', include((api_version_views, 'api_version_views'), namespace="api_version_views")),
 ]
@@ -4,6 +4,7 @@ from django.db.models import Q
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 from helpers.response_helper import HelperResponse
+from helpers.session_cache_helper import HelperSessionCache
 
 
 User = get_user_model()
@@ -52,13 +53,16 @@ class AuthService:
             response.set_status(code=status.HTTP_401_UNAUTHORIZED)
         return response.to_dict()
 
-    def logout(self, refresh_token, user):
+    def logout(self, refresh_token, user, access_token=None):
         """Cerrar sesión"""
         from rest_framework_simplejwt.tokens import RefreshToken
         response = HelperResponse()
         try:
 
             token = RefreshToken(refresh_token)
+            if access_token is not None:
+                # El access token sigue vigente hasta su exp: se revoca aquí y en los demás servicios
+                HelperSessionCache.revoke(access_token.get('jti'), access_token.get('exp'))
             token.blacklist()
             response.set_success(is_success=True)
             response.set_message(message="Sesión cerrada exitosamente")
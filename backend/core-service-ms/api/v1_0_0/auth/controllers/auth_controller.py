@@ -42,7 +42,7 @@ class SignOutController(APIView):
             response.set_message(message='Refresh token is required')
             response.set_status(code=status.HTTP_400_BAD_REQUEST)
             return response.to_dict()
-        return self.auth_service.logout(refresh_token, request.user)
+        return self.auth_service.logout(refresh_token, request.user, access_token=request.auth)
 
 
 class RefreshTokenController(TokenViewBase):
@@ -23,7 +23,7 @@ class CompanyBranchController:
             iTotalDisplayRecords = data.get("iTotalDisplayRecords", 0)
             self.response.set_success(True)
             self.response.set_status(status.HTTP_200_OK)
-            self.response.set_datatable(aaData, iTotalRecords, iTotalDisplayRecords)
+            self.response.set_datatable(aaData, iTotalRecords, iTotalDisplayRecords, data.get('siguiente'))
         except Exception as ex:
             self.response.set_success(False)
             self.response.set_status(status.HTTP_200_OK)
@@ -20,6 +20,8 @@ class CompanyService(MyBusiness):
             search = self.request.query_params.get('sSearch', '')
             limit = int(self.request.query_params.get('iDisplayLength', 10))
             offset = int(self.request.query_params.get('iDisplayStart', 0))
+            # Cursor de la página anterior ('siguiente'): reemplaza a iDisplayStart en tablas grandes
+            cursor = self.request.query_params.get('cursor')
 
             # --- Parámetros de ordenamiento ---
             sort_by = self.request.query_params.get('sort_by', 'name')
@@ -45,13 +47,15 @@ class CompanyService(MyBusiness):
             aData, iTotalRecords, iTotalDisplayRecords = Company.objects.datatable(conditions=conditions,
                                                                                    limit=limit,
                                                                                    offset=offset,
-                                                                                   order_by=order_by)
+                                                                                   order_by=order_by,
+                                                                                   cursor=cursor)
             aaData = CompanySerializer(aData, many=True, context={'request': self.request}).data if aData else []
             o_bus.set_success(is_success=True)
             o_bus.set_data(data={
                 'aaData': aaData,
                 'iTotalRecords': iTotalRecords,
-                'iTotalDisplayRecords': iTotalDisplayRecords
+                'iTotalDisplayRecords': iTotalDisplayRecords,
+                'siguiente': Company.objects.datatable_cursor(aData[-1], order_by) if aData and len(aData) == limit else None
             })
         except Exception as e:
             o_bus.set_success(is_success=False)
@@ -33,7 +33,7 @@ class SessionService(MyBusiness):
         try:
             branch_id = self.request.data.get("id")
             try:
-                branch = CompanyBranch.objects.get(id=branch_id)
+                branch = CompanyBranch.objects.cached_get(id=branch_id)
             except CompanyBranch.DoesNotExist:
                 raise NameError('Sede no encontrada')
             user = self.request.user
@@ -81,7 +81,7 @@ class SessionService(MyBusiness):
                 raise NameError('Sede no encontrada')
             role_id = self.request.data.get('id')
             try:
-                role = Role.objects.get(id=role_id)
+                role = Role.objects.cached_get(id=role_id)
             except Role.DoesNotExist:
                 raise NameError('Rol no encontrado')
             user = self.request.user
@@ -43,12 +43,14 @@ class CalificacionController:
             return self.response.to_dict()
     
     def mis_calificaciones(self):
-        """Obtiene las calificaciones que el usuario ha dado"""
+        """Obtiene una página de las calificaciones que el usuario ha dado (limit, cursor)"""
         from .service import CalificacionService
         
         try:
             service = CalificacionService(request=self.request)
-            resultado = service.obtener_mis_calificaciones(self.request.user)
+            resultado = service.obtener_mis_calificaciones(
+                self.request.user, self.request.query_params.get('limit'), self.request.query_params.get('cursor')
+            )
             
             if not resultado.is_success:
                 raise NameError(resultado.message)
@@ -65,12 +67,14 @@ class CalificacionController:
         return self.response.to_dict()
     
     def recibidas(self):
-        """Obtiene las calificaciones que el usuario ha recibido"""
+        """Obtiene una página de las calificaciones que el usuario ha recibido (limit, cursor)"""
         from .service import CalificacionService
         
         try:
             service = CalificacionService(request=self.request)
-            resultado = service.obtener_calificaciones_recibidas(self.request.user)
+            resultado = service.obtener_calificaciones_recibidas(
+                self.request.user, self.request.query_params.get('limit'), self.request.query_params.get('cursor')
+            )
             
             if not resultado.is_success:
                 raise NameError(resultado.message)
@@ -85,7 +89,31 @@ class CalificacionController:
             self.response.set_status(status.HTTP_400_BAD_REQUEST)
         
         return self.response.to_dict()
-
-
-
-
+    
+    def exportar(self, listado, nombre):
+        """Historial completo de calificaciones, enviado por partes (?formato=json|ndjson)"""
+        from .service import CalificacionService
+        
+        try:
+            service = CalificacionService(request=self.request)
+            self.response.set_success(True)
+            self.response.set_status(status.HTTP_200_OK)
+            self.response.set_stream(
+                service.exportar(self.request.user, listado),
+                stream_format=HelperResponse.get_stream_format(self.request),
+                filename=nombre
+            )
+        except Exception as e:
+            self.response.set_success(False)
+            self.response.set_message(str(e))
+            self.response.set_status(status.HTTP_400_BAD_REQUEST)
+        
+        return self.response.to_dict()
+    
+    def exportar_mis_calificaciones(self):
+        from .service import CalificacionService
+        return self.exportar(CalificacionService.PROPIAS, 'mis_calificaciones')
+    
+    def exportar_recibidas(self):
+        from .service import CalificacionService
+        return self.exportar(CalificacionService.RECIBIDAS, 'calificaciones_recibidas')
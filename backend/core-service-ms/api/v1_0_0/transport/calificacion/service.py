@@ -1,15 +1,23 @@
-from django.db.models import Avg
-from security.models import Calificacion, Viaje, Conductor
+from decimal import Decimal
+from django.db.models import F
+from core.my_base import MY_CALIFICACION_VIDA_MEDIA_DIAS
+from security.models import Calificacion, Viaje, Conductor, ResumenCalificacion
 from helpers.service_helper import HelperService
+from helpers.cursor_helper import HelperCursor
 
 
 class CalificacionService(HelperService):
-    
+    VIDA_MEDIA_DIAS = MY_CALIFICACION_VIDA_MEDIA_DIAS
+    LIMITE_CALIFICACIONES = 50
+    LIMITE_MAXIMO_CALIFICACIONES = 100
+    TAMANO_EXPORTACION = 500
+
     def crear_calificacion(self, data, calificador):
         """Crea una nueva calificación"""
         try:
-            viaje_id = data.get('viaje')
-            calificado_id = data.get('calificado')
+            # CalificacionForm entrega instancias en cleaned_data; también se aceptan ids
+            viaje_id = getattr(data.get('viaje'), 'pk', data.get('viaje'))
+            calificado_id = getattr(data.get('calificado'), 'pk', data.get('calificado'))
             puntuacion = data.get('puntuacion')
             comentario = data.get('comentario', '')
             
@@ -40,9 +48,8 @@ class CalificacionService(HelperService):
                 comentario=comentario
             )
             
-            # Actualizar calificación promedio del conductor si es conductor el calificado
-            if hasattr(calificado_real, 'conductor_profile'):
-                self._actualizar_calificacion_promedio(calificado_real)
+            # Agregados del calificado y promedio del conductor, sin recorrer su historial
+            self._acumular_calificacion(calificacion)
             
             # Actualizar calificaciones en el viaje
             if viaje.pasajero == calificador:
@@ -59,78 +66,119 @@ class CalificacionService(HelperService):
         except Exception as e:
             return self.error_response(str(e))
     
-    def _actualizar_calificacion_promedio(self, usuario):
-        """Actualiza la calificación promedio del conductor"""
-        try:
-            conductor = Conductor.objects.get(user=usuario)
-            promedio = Calificacion.objects.filter(
-                calificado=usuario
-            ).aggregate(promedio=Avg('puntuacion'))['promedio']
-            
-            if promedio:
-                conductor.calificacion_promedio = round(promedio, 2)
-                conductor.save()
-        except Conductor.DoesNotExist:
-            pass
-        except Exception as e:
-            print(f"Error al actualizar calificación promedio: {e}")
-    
-    def obtener_mis_calificaciones(self, usuario):
-        """Obtiene las calificaciones que el usuario ha dado"""
+    @classmethod
+    def factor_decaimiento(cls, desde, hasta):
+        """Peso que conserva en `hasta` una calificación de `desde` (vida media VIDA_MEDIA_DIAS)"""
+        if desde is None or not cls.VIDA_MEDIA_DIAS:
+            return 1.0
+        segundos = max(0.0, (hasta - desde).total_seconds())
+        return 0.5 ** (segundos / (cls.VIDA_MEDIA_DIAS * 86400))
+
+    @staticmethod
+    def promedio_conductor(suma, total):
+        return round(Decimal(suma) / Decimal(total), 2) if total else Decimal('0.00')
+
+    def _acumular_calificacion(self, calificacion):
+        """
+        Suma la calificación a los agregados del calificado dentro de la transacción en curso.
+        La fila del resumen se bloquea para que calificaciones simultáneas no pisen el puntaje reciente.
+        """
+        puntuacion = int(calificacion.puntuacion)
+        fecha = calificacion.fecha_calificacion
+        resumen, _ = ResumenCalificacion.objects.get_or_create(usuario_id=calificacion.calificado_id)
+        resumen = ResumenCalificacion.objects.select_for_update().only(
+            'id', 'suma', 'total', 'decaida_suma', 'decaida_peso', 'decaida_fecha'
+        ).get(id=resumen.id)
+
+        factor = self.factor_decaimiento(resumen.decaida_fecha, fecha)
+        ResumenCalificacion.objects.filter(id=resumen.id).update(**{
+            'suma': F('suma') + puntuacion,
+            'total': F('total') + 1,
+            f'estrellas_{puntuacion}': F(f'estrellas_{puntuacion}') + 1,
+            'decaida_suma': resumen.decaida_suma * factor + puntuacion,
+            'decaida_peso': resumen.decaida_peso * factor + 1,
+            'decaida_fecha': max(fecha, resumen.decaida_fecha) if resumen.decaida_fecha else fecha,
+        })
+        Conductor.objects.filter(user_id=calificacion.calificado_id).update(
+            calificacion_promedio=self.promedio_conductor(resumen.suma + puntuacion, resumen.total + 1)
+        )
+
+    # Contraparte de cada listado: 'calificado' en las que el usuario dio, 'calificador' en las recibidas
+    PROPIAS = ('calificador', 'calificado')
+    RECIBIDAS = ('calificado', 'calificador')
+
+    @staticmethod
+    def _consulta(usuario, listado):
+        """Solo las columnas que se serializan; el viaje se lee como viaje_id, sin JOIN"""
+        propietario, contraparte = listado
+        return Calificacion.objects.filter(**{propietario: usuario}).values(
+            'id', 'viaje_id', 'puntuacion', 'comentario', 'fecha_calificacion',
+            f'{contraparte}_id', f'{contraparte}__first_name', f'{contraparte}__last_name',
+        ).order_by('-fecha_calificacion', '-id')
+
+    @staticmethod
+    def _serializar(fila, listado):
+        contraparte = listado[1]
+        nombre = f"{fila[f'{contraparte}__first_name']} {fila[f'{contraparte}__last_name']}"
+        return {
+            'id': fila['id'],
+            'viaje_id': fila['viaje_id'],
+            contraparte: {
+                'id': fila[f'{contraparte}_id'],
+                'nombre': nombre.strip()
+            },
+            'puntuacion': fila['puntuacion'],
+            'comentario': fila['comentario'],
+            'fecha': fila['fecha_calificacion']
+        }
+
+    def _pagina(self, usuario, listado, limit, cursor):
+        """Página por cursor sobre (fecha_calificacion, id); 'siguiente' es None en la última"""
+        calificaciones = self._consulta(usuario, listado)
+        if cursor:
+            calificaciones = calificaciones.filter(HelperCursor.filtro(cursor, 'fecha_calificacion'))
+
+        filas = list(calificaciones[:limit + 1])
+        siguiente = None
+        if len(filas) > limit:
+            ultima = filas[limit - 1]
+            siguiente = HelperCursor.codificar(ultima['fecha_calificacion'], ultima['id'])
+        return [self._serializar(fila, listado) for fila in filas[:limit]], siguiente
+
+    def exportar(self, usuario, listado):
+        """
+        Todas las calificaciones del listado como un generador de dicts: las filas se leen con
+        iterator() y se serializan a medida que HelperResponse las envía
+        """
+        filas = self._consulta(usuario, listado).iterator(chunk_size=self.TAMANO_EXPORTACION)
+        return (self._serializar(fila, listado) for fila in filas)
+
+    def obtener_mis_calificaciones(self, usuario, limit=None, cursor=None):
+        """Obtiene las calificaciones que el usuario ha dado, de la más reciente a la más antigua"""
         try:
-            calificaciones = Calificacion.objects.filter(
-                calificador=usuario
-            ).select_related('viaje', 'calificado').order_by('-fecha_calificacion')
-            
+            limit = HelperCursor.limite(limit, self.LIMITE_CALIFICACIONES, self.LIMITE_MAXIMO_CALIFICACIONES)
+            calificaciones, siguiente = self._pagina(usuario, self.PROPIAS, limit, cursor)
             return self.success_response({
-                'calificaciones': [
-                    {
-                        'id': c.id,
-                        'viaje_id': c.viaje.id,
-                        'calificado': {
-                            'id': c.calificado.id,
-                            'nombre': c.calificado.get_full_name()
-                        },
-                        'puntuacion': c.puntuacion,
-                        'comentario': c.comentario,
-                        'fecha': c.fecha_calificacion.isoformat()
-                    }
-                    for c in calificaciones
-                ]
+                'calificaciones': calificaciones,
+                'siguiente': siguiente
             })
         except Exception as e:
             return self.error_response(str(e))
     
-    def obtener_calificaciones_recibidas(self, usuario):
-        """Obtiene las calificaciones que el usuario ha recibido"""
+    def obtener_calificaciones_recibidas(self, usuario, limit=None, cursor=None):
+        """Obtiene las calificaciones que el usuario ha recibido, de la más reciente a la más antigua"""
         try:
-            calificaciones = Calificacion.objects.filter(
-                calificado=usuario
-            ).select_related('viaje', 'calificador').order_by('-fecha_calificacion')
-            
-            promedio = calificaciones.aggregate(promedio=Avg('puntuacion'))['promedio']
+            limit = HelperCursor.limite(limit, self.LIMITE_CALIFICACIONES, self.LIMITE_MAXIMO_CALIFICACIONES)
+            calificaciones, siguiente = self._pagina(usuario, self.RECIBIDAS, limit, cursor)
+            resumen = ResumenCalificacion.objects.filter(usuario=usuario).first() or ResumenCalificacion()
             
             return self.success_response({
-                'calificaciones': [
-                    {
-                        'id': c.id,
-                        'viaje_id': c.viaje.id,
-                        'calificador': {
-                            'id': c.calificador.id,
-                            'nombre': c.calificador.get_full_name()
-                        },
-                        'puntuacion': c.puntuacion,
-                        'comentario': c.comentario,
-                        'fecha': c.fecha_calificacion.isoformat()
-                    }
-                    for c in calificaciones
-                ],
-                'promedio': round(promedio, 2) if promedio else 0,
-                'total': calificaciones.count()
+                'calificaciones': calificaciones,
+                'siguiente': siguiente,
+                'promedio': resumen.promedio,
+                'total': resumen.total,
+                'estrellas': resumen.estrellas,
+                'puntaje_reciente': resumen.puntaje_reciente
             })
         except Exception as e:
             return self.error_response(str(e))
-
-
-
-
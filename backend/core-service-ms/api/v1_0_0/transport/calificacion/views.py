@@ -23,7 +23,15 @@ class CalificacionView(ViewSet):
         from .controller import CalificacionController
         controller = CalificacionController(request=request)
         return controller.recibidas()
-
-
-
-
+    
+    @action(methods=['get'], detail=False)
+    def exportar_mis_calificaciones(self, request):
+        from .controller import CalificacionController
+        controller = CalificacionController(request=request)
+        return controller.exportar_mis_calificaciones()
+    
+    @action(methods=['get'], detail=False)
+    def exportar_recibidas(self, request):
+        from .controller import CalificacionController
+        controller = CalificacionController(request=request)
+        return controller.exportar_recibidas()
@@ -143,6 +143,34 @@ class ConductorController:
         
         return self.response.to_dict()
     
+    def ubicaciones_batch(self):
+        """Ingresa un lote de ubicaciones del conductor"""
+        from .service import ConductorService
+        
+        try:
+            ubicaciones = self.request.data.get('ubicaciones')
+            
+            if not ubicaciones:
+                raise ValidationError('Debe proporcionar la lista de ubicaciones')
+            
+            service = ConductorService(request=self.request)
+            resultado = service.actualizar_ubicaciones_batch(ubicaciones, self.request.user)
+            
+            if not resultado.is_success:
+                raise NameError(resultado.message)
+            
+            self.response.set_success(True)
+            self.response.set_status(status.HTTP_200_OK)
+            self.response.set_message('Ubicaciones procesadas')
+            self.response.set_data(resultado.get_data())
+            
+        except Exception as e:
+            self.response.set_success(False)
+            self.response.set_message(str(e))
+            self.response.set_status(status.HTTP_400_BAD_REQUEST)
+        
+        return self.response.to_dict()
+    
     def cambiar_estado(self):
         """Cambia el estado del conductor"""
         from .service import ConductorService
@@ -205,9 +233,10 @@ class ConductorController:
             lat = self.request.query_params.get('lat')
             lng = self.request.query_params.get('lng')
             radio = self.request.query_params.get('radio', 5)
+            limit = self.request.query_params.get('limit') or self.request.query_params.get('k')
             
             service = ConductorService(request=self.request)
-            resultado = service.listar_conductores_disponibles(lat, lng, radio)
+            resultado = service.listar_conductores_disponibles(lat, lng, radio, limit)
             
             if not resultado.is_success:
                 raise NameError(resultado.message)
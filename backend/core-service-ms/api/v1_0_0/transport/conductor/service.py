@@ -1,10 +1,21 @@
+import time
+from math import isfinite
+from datetime import datetime
 from django.utils import timezone
 from security.models import Conductor, User, Profile
 from helpers.service_helper import HelperService
-from math import radians, sin, cos, asin, sqrt
+from helpers.geo_helper import HelperGeo
+from helpers.location_cache_helper import HelperLocationCache
+from helpers.event_helper import HelperEvents
+from core.my_base import MY_CONDUCTOR_RADIO_MAXIMO_KM
 
 
 class ConductorService(HelperService):
+    LIMITE_CONDUCTORES = 20
+    LIMITE_MAXIMO_CONDUCTORES = 100
+    LIMITE_UBICACIONES_BATCH = 500
+    RADIO_DEFECTO_KM = 5.0
+    RADIO_MAXIMO_KM = MY_CONDUCTOR_RADIO_MAXIMO_KM
     
     def __init__(self, *args, **kwargs):
         super(ConductorService, self).__init__()
@@ -75,20 +86,97 @@ class ConductorService(HelperService):
         except Exception as e:
             return self.error_response(str(e))
     
+    def obtener_conductor_id(self, usuario):
+        """Id del perfil de conductor del usuario, cacheado para no consultar la BD en cada ping"""
+        e_cache = Conductor.cache(usuario.id, field='user')
+        conductor_id = e_cache.get()
+        if conductor_id is None:
+            conductor_id = Conductor.objects.filter(user=usuario).values_list('id', flat=True).first()
+            if conductor_id is None:
+                raise Conductor.DoesNotExist
+            e_cache.set(conductor_id)
+        return conductor_id
+
     def actualizar_ubicacion(self, lat, lng, usuario):
         """Actualiza la ubicación del conductor en tiempo real"""
         try:
-            conductor = Conductor.objects.get(user=usuario)
-            conductor.ubicacion_actual_lat = lat
-            conductor.ubicacion_actual_lng = lng
-            conductor.ultima_actualizacion_ubicacion = timezone.now()
-            conductor.save()
+            # La posición se guarda en el almacén en memoria; la tabla Conductor se
+            # actualiza por lotes desde HelperLocationCache.flush
+            HelperLocationCache.set_location(self.obtener_conductor_id(usuario), lat, lng)
+            self.publicar_ubicacion(usuario, lat, lng, time.time())
             return self.success_response({'mensaje': 'Ubicación actualizada'})
         except Conductor.DoesNotExist:
             return self.error_response('El usuario no está registrado como conductor')
         except Exception as e:
             return self.error_response(str(e))
     
+    def actualizar_ubicaciones_batch(self, ubicaciones, usuario):
+        """Ingresa en una sola escritura un lote de posiciones con marca de tiempo del conductor"""
+        try:
+            if not isinstance(ubicaciones, (list, tuple)) or not ubicaciones:
+                return self.error_response('Debe proporcionar una lista de ubicaciones')
+            if len(ubicaciones) > self.LIMITE_UBICACIONES_BATCH:
+                return self.error_response(f'El lote no puede superar {self.LIMITE_UBICACIONES_BATCH} ubicaciones')
+
+            conductor_id = self.obtener_conductor_id(usuario)
+            ahora = time.time()
+            validas = []
+            for ubicacion in ubicaciones:
+                try:
+                    lat = float(ubicacion.get('lat'))
+                    lng = float(ubicacion.get('lng'))
+                    timestamp = self._parse_timestamp(ubicacion.get('timestamp'), ahora)
+                except (AttributeError, ValueError, TypeError):
+                    continue
+                # Descartar coordenadas fuera de rango, fijas futuras o más antiguas que el TTL
+                if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                    continue
+                if timestamp > ahora + 60 or timestamp < ahora - HelperLocationCache.TTL:
+                    continue
+                validas.append((timestamp, lat, lng))
+
+            # Solo la posición más reciente es relevante; si el almacén ya tiene una más
+            # nueva (reintentos fuera de orden) el lote no la sobrescribe
+            aceptada = max(validas) if validas else None
+            actual = HelperLocationCache.get_location(conductor_id) if aceptada else None
+            if actual and actual['timestamp'] >= aceptada[0]:
+                aceptada = None
+            if aceptada:
+                timestamp, lat, lng = aceptada
+                HelperLocationCache.set_location(conductor_id, lat, lng, timestamp)
+                self.publicar_ubicacion(usuario, lat, lng, timestamp)
+
+            return self.success_response({
+                'mensaje': 'Ubicaciones procesadas',
+                'recibidas': len(ubicaciones),
+                'validas': len(validas),
+                'ubicacion': {'lat': aceptada[1], 'lng': aceptada[2], 'timestamp': aceptada[0]} if aceptada else None,
+            })
+        except Conductor.DoesNotExist:
+            return self.error_response('El usuario no está registrado como conductor')
+        except Exception as e:
+            return self.error_response(str(e))
+
+    @staticmethod
+    def publicar_ubicacion(usuario, lat, lng, timestamp):
+        """Envía la posición en vivo a los viajes suscritos al conductor (canal por id de usuario)"""
+        HelperEvents.publish(
+            HelperEvents.channel(HelperEvents.CONDUCTOR_UBICACION, usuario.id),
+            'conductor.ubicacion',
+            {'lat': float(lat), 'lng': float(lng), 'timestamp': timestamp}
+        )
+
+    @staticmethod
+    def _parse_timestamp(value, default):
+        """Acepta epoch en segundos o milisegundos, o fecha ISO 8601"""
+        if value in (None, ''):
+            return default
+        try:
+            timestamp = float(value)
+        except (ValueError, TypeError):
+            return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+        return timestamp / 1000 if timestamp > 1e11 else timestamp
+
     def cambiar_estado(self, nuevo_estado, usuario):
         """Cambia el estado del conductor (disponible/no disponible/en_viaje)"""
         try:
@@ -118,20 +206,16 @@ class ConductorService(HelperService):
         except Exception as e:
             return self.error_response(str(e))
     
-    def listar_conductores_disponibles(self, lat=None, lng=None, radio_km=5):
-        """Lista conductores disponibles cerca de una ubicación"""
-        
-        def haversine(lat1, lon1, lat2, lon2):
-            """Calcula distancia en km entre dos puntos usando Haversine"""
-            R = 6371  # Radio de la Tierra en km
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a))
-            return R * c
-        
+    def listar_conductores_disponibles(self, lat=None, lng=None, radio_km=5, limit=None):
+        """Lista los conductores disponibles más cercanos a una ubicación"""
+        import heapq
+        import logging
+        logger = logging.getLogger(__name__)
+
         try:
+            limit = int(limit) if limit else self.LIMITE_CONDUCTORES
+            limit = max(1, min(limit, self.LIMITE_MAXIMO_CONDUCTORES))
+
             # Solo retornar conductores que estén disponibles
             # No mostrar conductores en estado 'no_disponible' o 'en_viaje'
             conductores = Conductor.objects.filter(
@@ -140,56 +224,62 @@ class ConductorService(HelperService):
                 es_verificado=True,
                 ubicacion_actual_lat__isnull=False,
                 ubicacion_actual_lng__isnull=False
+            ).select_related('user').only(
+                'id', 'calificacion_promedio', 'total_viajes',
+                'ubicacion_actual_lat', 'ubicacion_actual_lng',
+                'user__id', 'user__first_name', 'user__last_name',
             )
-            
-            # Log para verificar el filtro
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"🔍 Conductores disponibles encontrados: {conductores.count()}")
-            
-            conductores_cercanos = []
-            
+
             if lat and lng:
                 try:
                     lat = float(lat)
                     lng = float(lng)
-                    radio_km = float(radio_km)
-                    
-                    for conductor in conductores:
-                        if conductor.ubicacion_actual_lat and conductor.ubicacion_actual_lng:
-                            distancia = haversine(
-                                lat, lng,
-                                float(conductor.ubicacion_actual_lat),
-                                float(conductor.ubicacion_actual_lng)
-                            )
-                            if distancia <= radio_km:
-                                conductores_cercanos.append({
-                                    'id': conductor.id,
-                                    'user__first_name': conductor.user.first_name,
-                                    'user__last_name': conductor.user.last_name,
-                                    'calificacion_promedio': str(conductor.calificacion_promedio),
-                                    'total_viajes': conductor.total_viajes,
-                                    'ubicacion_actual_lat': float(conductor.ubicacion_actual_lat),
-                                    'ubicacion_actual_lng': float(conductor.ubicacion_actual_lng),
-                                    'distancia_km': round(distancia, 2)
-                                })
+                    radio_km = float(radio_km) if radio_km else self.RADIO_DEFECTO_KM
                 except (ValueError, TypeError) as e:
                     return self.error_response(f'Error en coordenadas: {str(e)}')
+                if not isfinite(radio_km) or radio_km <= 0:
+                    radio_km = self.RADIO_DEFECTO_KM
+                # El radio lo envía el cliente: acotado para que el rectángulo no abarque toda la tabla
+                radio_km = min(radio_km, self.RADIO_MAXIMO_KM)
+
+                # Pre-filtro por rectángulo usando el índice (estado, lat, lng);
+                # Haversine solo se calcula sobre los candidatos del rectángulo
+                lat_min, lat_max, lng_min, lng_max = HelperGeo.bounding_box(lat, lng, radio_km)
+                candidatos = conductores.filter(
+                    ubicacion_actual_lat__range=(lat_min, lat_max),
+                    ubicacion_actual_lng__range=(lng_min, lng_max),
+                )
+
+                # Las columnas se persisten cada MY_UBICACION_FLUSH_INTERVAL: la distancia se calcula
+                # con la última posición en vivo del candidato cuando existe
+                candidatos = list(candidatos)
+                ubicaciones = HelperLocationCache.get_locations([c.id for c in candidatos])
+                cercanos = []
+                for conductor in candidatos:
+                    self._aplicar_ubicacion(conductor, ubicaciones.get(conductor.id))
+                    distancia = HelperGeo.haversine(
+                        lat, lng,
+                        float(conductor.ubicacion_actual_lat),
+                        float(conductor.ubicacion_actual_lng)
+                    )
+                    if distancia <= radio_km:
+                        cercanos.append((distancia, conductor.id, conductor))
+
+                conductores_cercanos = [
+                    dict(self._conductor_disponible_dict(conductor), distancia_km=round(distancia, 2))
+                    for distancia, _, conductor in heapq.nsmallest(limit, cercanos)
+                ]
             else:
-                # Si no se proporcionan coordenadas, retornar todos los disponibles
+                # Si no se proporcionan coordenadas, retornar los disponibles hasta el límite
+                conductores = list(conductores[:limit])
+                ubicaciones = HelperLocationCache.get_locations([c.id for c in conductores])
                 conductores_cercanos = [
-                    {
-                        'id': c.id,
-                        'user__first_name': c.user.first_name,
-                        'user__last_name': c.user.last_name,
-                        'calificacion_promedio': str(c.calificacion_promedio),
-                        'total_viajes': c.total_viajes,
-                        'ubicacion_actual_lat': float(c.ubicacion_actual_lat) if c.ubicacion_actual_lat else None,
-                        'ubicacion_actual_lng': float(c.ubicacion_actual_lng) if c.ubicacion_actual_lng else None,
-                    }
+                    self._conductor_disponible_dict(self._aplicar_ubicacion(c, ubicaciones.get(c.id)))
                     for c in conductores
                 ]
-            
+
+            logger.info(f"🔍 Conductores disponibles retornados: {len(conductores_cercanos)}")
+
             return self.success_response({
                 'conductores': conductores_cercanos,
                 'total': len(conductores_cercanos)
@@ -197,6 +287,26 @@ class ConductorService(HelperService):
         except Exception as e:
             return self.error_response(str(e))
 
+    @staticmethod
+    def _aplicar_ubicacion(conductor, ubicacion):
+        """Reemplaza la posición persistida del conductor por su posición en vivo, si la hay"""
+        if ubicacion:
+            conductor.ubicacion_actual_lat = ubicacion['lat']
+            conductor.ubicacion_actual_lng = ubicacion['lng']
+        return conductor
+
+    @staticmethod
+    def _conductor_disponible_dict(conductor):
+        return {
+            'id': conductor.id,
+            'user__first_name': conductor.user.first_name,
+            'user__last_name': conductor.user.last_name,
+            'calificacion_promedio': str(conductor.calificacion_promedio),
+            'total_viajes': conductor.total_viajes,
+            'ubicacion_actual_lat': float(conductor.ubicacion_actual_lat) if conductor.ubicacion_actual_lat else None,
+            'ubicacion_actual_lng': float(conductor.ubicacion_actual_lng) if conductor.ubicacion_actual_lng else None,
+        }
+
 
 
 
@@ -30,6 +30,12 @@ class ConductorView(ViewSet):
         controller = ConductorController(request=request)
         return controller.actualizar_ubicacion()
     
+    @action(methods=['post'], detail=False)
+    def ubicaciones_batch(self, request):
+        from .controller import ConductorController
+        controller = ConductorController(request=request)
+        return controller.ubicaciones_batch()
+    
     @action(methods=['post'], detail=False)
     def cambiar_estado(self, request):
         from .controller import ConductorController
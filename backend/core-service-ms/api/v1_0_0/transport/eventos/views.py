@@ -0,0 +1,174 @@
+import json
+from contextlib import aclosing
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from helpers.event_helper import HelperEvents
+from helpers.location_cache_helper import HelperLocationCache
+
+
+# Canal de eventos (Server-Sent Events) para reemplazar el polling de las pantallas de
+# espera y viaje activo. Requiere servir la aplicación con server.asgi.
+
+ESPERA_MAXIMA = 30
+# La posición del conductor solo se comparte mientras el viaje está en curso
+VIAJE_ACTIVOS = ('aceptado', 'en_camino_origen', 'llegado_origen', 'en_viaje')
+VIAJE_FINALES = ('completado', 'cancelado')
+
+def _error(message, code):
+    return JsonResponse({'is_success': False, 'message': message}, status=code)
+
+
+async def _autenticar(request):
+    from core.my_authentication import CustomJWTAuthentication
+    resultado = await sync_to_async(CustomJWTAuthentication().authenticate)(request)
+    return resultado[0] if resultado else None
+
+
+def _sse(evento):
+    if evento is None:
+        return ": ping\n\n"
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento['data'], default=str)}\n\n"
+
+
+async def _stream(canales, inicial, fin=None):
+    yield "retry: 3000\n\n"
+    eventos = HelperEvents.subscribe(canales, initial=inicial)
+    async with aclosing(eventos):
+        async for evento in eventos:
+            yield _sse(evento)
+            # fin(evento) cierra el stream tras enviar ese evento
+            if evento is not None and fin is not None and fin(evento):
+                return
+
+
+def _streaming_response(canales, inicial, fin=None):
+    response = StreamingHttpResponse(_stream(canales, inicial, fin), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def eventos_solicitud(request, pk):
+    """Estado de una solicitud del pasajero: snapshot inicial y luego cada transición"""
+    from security.models import SolicitudViaje
+
+    if request.method != 'GET':
+        return _error('Método no permitido', status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        usuario = await _autenticar(request)
+    except AuthenticationFailed as e:
+        return _error(str(e.detail), status.HTTP_401_UNAUTHORIZED)
+    if usuario is None:
+        return _error('Token de autenticación faltante', status.HTTP_401_UNAUTHORIZED)
+
+    consulta = SolicitudViaje.objects.filter(id=pk, pasajero=usuario).values('id', 'estado')
+    if not await consulta.aexists():
+        return _error('Solicitud no encontrada', status.HTTP_404_NOT_FOUND)
+
+    async def inicial():
+        return {'tipo': 'solicitud.estado', 'data': await consulta.afirst()}
+
+    return _streaming_response([HelperEvents.channel(HelperEvents.SOLICITUD, pk)], inicial)
+
+
+async def eventos_viaje(request, pk):
+    """Estado de un viaje y posición en vivo de su conductor, para pasajero y conductor"""
+    from security.models import Viaje, Conductor
+
+    if request.method != 'GET':
+        return _error('Método no permitido', status.HTTP_405_METHOD_NOT_ALLOWED)
+    try:
+        usuario = await _autenticar(request)
+    except AuthenticationFailed as e:
+        return _error(str(e.detail), status.HTTP_401_UNAUTHORIZED)
+    if usuario is None:
+        return _error('Token de autenticación faltante', status.HTTP_401_UNAUTHORIZED)
+
+    consulta = Viaje.objects.filter(
+        Q(pasajero=usuario) | Q(conductor=usuario), id=pk
+    ).values('id', 'estado', 'conductor_id')
+    viaje = await consulta.afirst()
+    if viaje is None:
+        return _error('Viaje no encontrado', status.HTTP_404_NOT_FOUND)
+
+    # Viaje terminado: 204 hace que EventSource deje de reconectar
+    if viaje['estado'] in VIAJE_FINALES:
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+    canales = [HelperEvents.channel(HelperEvents.VIAJE, pk)]
+    ubicacion_activa = bool(viaje['conductor_id']) and viaje['estado'] in VIAJE_ACTIVOS
+    if ubicacion_activa:
+        canales.append(HelperEvents.channel(HelperEvents.CONDUCTOR_UBICACION, viaje['conductor_id']))
+
+    async def inicial():
+        actual = await consulta.afirst()
+        ubicacion = None
+        if ubicacion_activa and actual['estado'] in VIAJE_ACTIVOS:
+            conductor_id = await Conductor.objects.filter(
+                user_id=actual['conductor_id']
+            ).values_list('id', flat=True).afirst()
+            ubicacion = await sync_to_async(HelperLocationCache.get_location)(conductor_id) if conductor_id else None
+        return {
+            'tipo': 'viaje.estado',
+            'data': {'id': actual['id'], 'estado': actual['estado'], 'ubicacion_conductor': ubicacion},
+        }
+
+    def fin(evento):
+        # Al terminar el viaje se deja de enviar la posición; al iniciarse, el cliente reconecta
+        # para suscribirse a ella
+        if evento['tipo'] != 'viaje.estado':
+            return False
+        estado = (evento['data'] or {}).get('estado')
+        return estado in VIAJE_FINALES or (viaje['estado'] not in VIAJE_ACTIVOS and estado in VIAJE_ACTIVOS)
+
+    return _streaming_response(canales, inicial, fin)
+
+
+def _segundos_espera(valor):
+    try:
+        return max(0, min(int(float(valor)), ESPERA_MAXIMA))
+    except (TypeError, ValueError):
+        return 0
+
+
+async def estado_solicitud(request, pk):
+    """
+    GET solicitudes/<pk>/estado/ con long-polling opcional: con ?wait=<segundos> la respuesta
+    espera, sin ocupar un hilo, hasta que el estado difiera de ?estado= (por defecto
+    'pendiente') o venza el tiempo. La respuesta final siempre la arma SolicitudViajeView.estado.
+    """
+    from security.models import SolicitudViaje
+    from ..solicitud.views import SolicitudViajeView
+
+    espera = _segundos_espera(request.GET.get('wait'))
+    if espera:
+        try:
+            usuario = await _autenticar(request)
+        except AuthenticationFailed:
+            usuario = None
+        if usuario is not None:
+            # Sin usuario la vista responde el error de autenticación sin esperar
+            await _esperar_cambio_estado(
+                SolicitudViaje.objects.filter(id=pk).values('id', 'estado'),
+                HelperEvents.channel(HelperEvents.SOLICITUD, pk),
+                request.GET.get('estado') or 'pendiente',
+                espera
+            )
+
+    vista = SolicitudViajeView.as_view({'get': 'estado'})
+    return await sync_to_async(vista)(request, pk=pk)
+
+
+async def _esperar_cambio_estado(consulta, canal, estado_conocido, espera):
+    async def inicial():
+        return {'tipo': 'solicitud.estado', 'data': await consulta.afirst()}
+
+    eventos = HelperEvents.subscribe([canal], initial=inicial, heartbeat=espera, max_duration=espera)
+    async with aclosing(eventos):
+        async for evento in eventos:
+            # None es el vencimiento de la espera; data None indica que la solicitud no existe
+            if evento is None or not evento['data'] or evento['data'].get('estado') != estado_conocido:
+                return
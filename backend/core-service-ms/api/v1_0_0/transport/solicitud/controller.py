@@ -69,9 +69,10 @@ class SolicitudViajeController:
             lat = self.request.query_params.get('lat')
             lng = self.request.query_params.get('lng')
             radio = self.request.query_params.get('radio', 5)
+            limit = self.request.query_params.get('limit')
             
             service = SolicitudViajeService(request=self.request)
-            resultado = service.listar_solicitudes_disponibles(lat, lng, radio)
+            resultado = service.listar_solicitudes_disponibles(lat, lng, radio, limit)
             
             if not resultado.is_success:
                 from django.core.exceptions import ValidationError
@@ -123,50 +124,48 @@ class SolicitudViajeController:
     
     def obtener_estado(self, solicitud_id):
         """Obtiene el estado actual de una solicitud"""
-        from security.models import SolicitudViaje, Viaje
+        from security.models import SolicitudViaje, Conductor
         
         try:
-            solicitud = SolicitudViaje.objects.get(id=solicitud_id)
+            # Una sola consulta: la solicitud con su viaje, conductor, perfil de conductor y moto
+            solicitud = SolicitudViaje.objects.select_related(
+                'viaje__conductor__conductor_profile', 'viaje__moto'
+            ).only(
+                'id', 'estado', 'pasajero_id', 'origen_lat', 'origen_lng', 'fecha_creacion',
+                'viaje__id', 'viaje__conductor__first_name', 'viaje__conductor__last_name',
+                'viaje__conductor__conductor_profile__calificacion_promedio', 'viaje__moto__placa',
+            ).get(id=solicitud_id)
             
             response_data = {
                 'estado': solicitud.estado,
                 'id': solicitud.id,
             }
             
-            # Si está aceptada, buscar el viaje y datos del conductor
+            # Si está aceptada, incluir el viaje y datos del conductor
+            viaje = None
             if solicitud.estado == 'aceptada':
+                viaje = solicitud.viaje or self._vincular_viaje(solicitud)
+            if viaje and viaje.conductor:
                 try:
-                    viaje = Viaje.objects.filter(
-                        pasajero=solicitud.pasajero,
-                        origen_lat=solicitud.origen_lat,
-                        origen_lng=solicitud.origen_lng,
-                    ).order_by('-fecha_aceptacion').first()
-                    
-                    if viaje and viaje.conductor:
-                        from security.models import Conductor
-                        try:
-                            conductor_profile = Conductor.objects.get(user=viaje.conductor)
-                            response_data['conductor'] = {
-                                'nombre': f"{viaje.conductor.first_name} {viaje.conductor.last_name}",
-                                'calificacion': str(conductor_profile.calificacion_promedio) if conductor_profile.calificacion_promedio else '5.0',
-                            }
-                            if viaje.moto:
-                                response_data['conductor']['placa'] = viaje.moto.placa
-                        except Conductor.DoesNotExist:
-                            response_data['conductor'] = {
-                                'nombre': f"{viaje.conductor.first_name} {viaje.conductor.last_name}",
-                                'calificacion': '5.0',
-                            }
-                        
-                        # Incluir viaje_id para navegación
-                        response_data['viaje_id'] = viaje.id
-                        
-                        # Calcular ETA (distancia / velocidad)
-                        # Por ahora retornamos un valor fijo, TODO: calcular real
-                        response_data['eta_minutos'] = 5
-                        
-                except Viaje.DoesNotExist:
-                    pass
+                    conductor_profile = viaje.conductor.conductor_profile
+                    response_data['conductor'] = {
+                        'nombre': f"{viaje.conductor.first_name} {viaje.conductor.last_name}",
+                        'calificacion': str(conductor_profile.calificacion_promedio) if conductor_profile.calificacion_promedio else '5.0',
+                    }
+                    if viaje.moto:
+                        response_data['conductor']['placa'] = viaje.moto.placa
+                except Conductor.DoesNotExist:
+                    response_data['conductor'] = {
+                        'nombre': f"{viaje.conductor.first_name} {viaje.conductor.last_name}",
+                        'calificacion': '5.0',
+                    }
+                
+                # Incluir viaje_id para navegación
+                response_data['viaje_id'] = viaje.id
+                
+                # Calcular ETA (distancia / velocidad)
+                # Por ahora retornamos un valor fijo, TODO: calcular real
+                response_data['eta_minutos'] = 5
             
             self.response.set_success(True)
             self.response.set_data(response_data)
@@ -183,6 +182,26 @@ class SolicitudViajeController:
         
         return self.response.to_dict()
     
+    @staticmethod
+    def _vincular_viaje(solicitud):
+        """
+        Solicitudes aceptadas antes de existir SolicitudViaje.viaje: busca el viaje por
+        pasajero y origen una única vez y guarda el enlace
+        """
+        from security.models import SolicitudViaje, Viaje
+        
+        viaje = Viaje.objects.select_related('conductor__conductor_profile', 'moto').filter(
+            pasajero_id=solicitud.pasajero_id,
+            origen_lat=solicitud.origen_lat,
+            origen_lng=solicitud.origen_lng,
+            fecha_solicitud__gte=solicitud.fecha_creacion,
+            solicitud__isnull=True,
+        ).order_by('fecha_solicitud').first()
+        if viaje is not None:
+            solicitud.viaje = viaje
+            SolicitudViaje.objects.filter(id=solicitud.id).update(viaje=viaje)
+        return viaje
+    
     def cancelar(self):
         """Cancela una solicitud"""
         from .service import SolicitudViajeService
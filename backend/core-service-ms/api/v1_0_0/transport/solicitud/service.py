@@ -1,11 +1,32 @@
+import logging
+from math import isfinite
 from datetime import datetime, timedelta
+from django.core.cache import cache
 from django.utils import timezone
 from security.models import SolicitudViaje, Viaje
+from django.db import transaction
 from helpers.service_helper import HelperService
-from math import radians, cos, sin, asin, sqrt
+from helpers.geo_helper import HelperGeo
+from helpers.geo_index_helper import HelperGeoIndex
+from helpers.event_helper import HelperEvents
+from core.my_base import MY_SOLICITUD_EXPIRACION_INTERVAL, MY_SOLICITUD_EXPIRACION_BATCH, MY_SOLICITUD_RADIO_MAXIMO_KM
+from core.my_cache import RedisKeys
+
+logger = logging.getLogger(__name__)
 
 
 class SolicitudViajeService(HelperService):
+    GEO_INDEX_SOLICITUDES = 'solicitudes'
+    LIMITE_SOLICITUDES = 50
+    LIMITE_MAXIMO_SOLICITUDES = 100
+    RADIO_MAXIMO_KM = MY_SOLICITUD_RADIO_MAXIMO_KM
+    EXPIRACION_INTERVAL = MY_SOLICITUD_EXPIRACION_INTERVAL
+    EXPIRACION_BATCH = MY_SOLICITUD_EXPIRACION_BATCH
+    CAMPOS_SOLICITUD_DISPONIBLE = (
+        'id', 'origen_lat', 'origen_lng', 'origen_direccion',
+        'destino_lat', 'destino_lng', 'destino_direccion',
+        'precio_solicitado', 'metodo_pago',
+    )
     
     def crear_solicitud(self, data, usuario):
         """Crea una nueva solicitud de viaje"""
@@ -19,6 +40,8 @@ class SolicitudViajeService(HelperService):
                 estado='pendiente',
                 **data
             )
+            # Indexar solo si la transacción de creación se confirma
+            transaction.on_commit(lambda: self.indexar_solicitud(solicitud))
             self.set_success(True)
             self.set_message('Solicitud creada exitosamente')
             self.set_data({'id': solicitud.id})
@@ -28,102 +51,71 @@ class SolicitudViajeService(HelperService):
             self.set_message(str(e))
             return self
     
-    def listar_solicitudes_disponibles(self, lat=None, lng=None, radio_km=5):
-        """Lista solicitudes disponibles cerca de una ubicación"""
-        
-        def haversine(lat1, lon1, lat2, lon2):
-            """Calcula distancia en km entre dos puntos usando Haversine"""
-            R = 6371  # Radio de la Tierra en km
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a))
-            return R * c
-        
+    def listar_solicitudes_disponibles(self, lat=None, lng=None, radio_km=5, limit=None):
+        """Lista las solicitudes pendientes más cercanas a una ubicación"""
         try:
-            import logging
-            logger = logging.getLogger(__name__)
-            
-            # Obtener todas las solicitudes pendientes y no expiradas
+            self.expirar_si_corresponde()
+            limit = int(limit) if limit else self.LIMITE_SOLICITUDES
+            limit = max(1, min(limit, self.LIMITE_MAXIMO_SOLICITUDES))
+
+            # Solicitudes pendientes y no expiradas
             solicitudes = SolicitudViaje.objects.filter(
                 estado='pendiente',
                 fecha_expiracion__gt=timezone.now()
-            )
-            
-            logger.info(f"📋 Solicitudes encontradas (pendientes, no expiradas): {solicitudes.count()}")
-            
+            ).only(*self.CAMPOS_SOLICITUD_DISPONIBLE)
+
             solicitudes_cercanas = []
-            
+
             # Validar y convertir coordenadas
             try:
                 if lat is not None and lng is not None and str(lat).lower() != 'null' and str(lng).lower() != 'null':
                     lat = float(lat)
                     lng = float(lng)
                     radio_km = float(radio_km) if radio_km else 10.0
-                    
-                    logger.info(f"📍 Filtrando por ubicación: lat={lat}, lng={lng}, radio={radio_km}km")
-                    
-                    for solicitud in solicitudes:
-                        try:
-                            distancia = haversine(
-                                lat, lng,
-                                float(solicitud.origen_lat),
-                                float(solicitud.origen_lng)
-                            )
-                            
-                            if distancia <= radio_km:
-                                sol_dict = {
-                                    'id': solicitud.id,
-                                    'origen_lat': str(solicitud.origen_lat),
-                                    'origen_lng': str(solicitud.origen_lng),
-                                    'origen_direccion': solicitud.origen_direccion,
-                                    'destino_lat': str(solicitud.destino_lat),
-                                    'destino_lng': str(solicitud.destino_lng),
-                                    'destino_direccion': solicitud.destino_direccion,
-                                    'precio_solicitado': str(solicitud.precio_solicitado),
-                                    'metodo_pago': solicitud.metodo_pago,
-                                    'distancia': round(distancia, 2),
-                                }
-                                solicitudes_cercanas.append(sol_dict)
-                        except (ValueError, TypeError) as e:
-                            logger.warning(f"Error calculando distancia para solicitud {solicitud.id}: {e}")
-                            continue
+                    if not isfinite(radio_km) or radio_km <= 0:
+                        radio_km = 10.0
+                    # El radio lo envía el cliente: acotado para no leer miles de celdas del índice
+                    radio_km = min(radio_km, self.RADIO_MAXIMO_KM)
                 else:
-                    # Si no hay ubicación válida, retornar todas las solicitudes pendientes
-                    logger.info("📍 Sin ubicación válida, retornando todas las solicitudes pendientes")
-                    for solicitud in solicitudes:
-                        solicitudes_cercanas.append({
-                            'id': solicitud.id,
-                            'origen_lat': str(solicitud.origen_lat),
-                            'origen_lng': str(solicitud.origen_lng),
-                            'origen_direccion': solicitud.origen_direccion,
-                            'destino_lat': str(solicitud.destino_lat),
-                            'destino_lng': str(solicitud.destino_lng),
-                            'destino_direccion': solicitud.destino_direccion,
-                            'precio_solicitado': str(solicitud.precio_solicitado),
-                            'metodo_pago': solicitud.metodo_pago,
-                            'distancia': 0,
-                        })
+                    lat = lng = None
             except (ValueError, TypeError) as e:
                 logger.error(f"Error procesando coordenadas: {e}")
-                # En caso de error, retornar todas las solicitudes
-                for solicitud in solicitudes:
-                    solicitudes_cercanas.append({
-                        'id': solicitud.id,
-                        'origen_lat': str(solicitud.origen_lat),
-                        'origen_lng': str(solicitud.origen_lng),
-                        'origen_direccion': solicitud.origen_direccion,
-                        'destino_lat': str(solicitud.destino_lat),
-                        'destino_lng': str(solicitud.destino_lng),
-                        'destino_direccion': solicitud.destino_direccion,
-                        'precio_solicitado': str(solicitud.precio_solicitado),
-                        'metodo_pago': solicitud.metodo_pago,
-                        'distancia': 0,
-                    })
-            
+                lat = lng = None
+
+            if lat is not None:
+                # Solo se consultan las solicitudes indexadas en las celdas cercanas
+                candidatos_ids = HelperGeoIndex.nearby(self.GEO_INDEX_SOLICITUDES, lat, lng, radio_km)
+                if candidatos_ids is None:
+                    # Demasiadas celdas (latitudes extremas): pre-filtro por rectángulo en BD
+                    lat_min, lat_max, lng_min, lng_max = HelperGeo.bounding_box(lat, lng, radio_km)
+                    candidatos = list(solicitudes.filter(
+                        origen_lat__range=(lat_min, lat_max),
+                        origen_lng__range=(lng_min, lng_max),
+                    ))
+                else:
+                    candidatos = list(solicitudes.filter(id__in=candidatos_ids)) if candidatos_ids else []
+                distancias = HelperGeo.distancias(
+                    lat, lng,
+                    [(float(s.origen_lat), float(s.origen_lng)) for s in candidatos]
+                )
+                cercanas = sorted(
+                    (distancia, solicitud.id, solicitud)
+                    for distancia, solicitud in zip(distancias, candidatos)
+                    if distancia <= radio_km
+                )[:limit]
+                solicitudes_cercanas = [
+                    self._solicitud_disponible_dict(solicitud, round(distancia, 2))
+                    for distancia, _, solicitud in cercanas
+                ]
+            else:
+                # Si no hay ubicación válida, retornar las solicitudes pendientes hasta el límite
+                solicitudes_cercanas = [
+                    self._solicitud_disponible_dict(solicitud, 0)
+                    for solicitud in solicitudes[:limit]
+                ]
+
             logger.info(f"✅ Solicitudes a retornar: {len(solicitudes_cercanas)}")
-            
+
             self.set_success(True)
             self.set_data({'solicitudes': solicitudes_cercanas})
             return self
@@ -134,41 +126,131 @@ class SolicitudViajeService(HelperService):
             self.set_success(False)
             self.set_message(str(e))
             return self
+
+    @staticmethod
+    def _solicitud_disponible_dict(solicitud, distancia):
+        return {
+            'id': solicitud.id,
+            'origen_lat': str(solicitud.origen_lat),
+            'origen_lng': str(solicitud.origen_lng),
+            'origen_direccion': solicitud.origen_direccion,
+            'destino_lat': str(solicitud.destino_lat),
+            'destino_lng': str(solicitud.destino_lng),
+            'destino_direccion': solicitud.destino_direccion,
+            'precio_solicitado': str(solicitud.precio_solicitado),
+            'metodo_pago': solicitud.metodo_pago,
+            'distancia': distancia,
+        }
+
+    @classmethod
+    def indexar_solicitud(cls, solicitud):
+        """Agrega la solicitud al índice geográfico por celda de origen"""
+        HelperGeoIndex.add(cls.GEO_INDEX_SOLICITUDES, solicitud.id, solicitud.origen_lat, solicitud.origen_lng)
+
+    @classmethod
+    def desindexar_solicitudes(cls, solicitudes):
+        """Quita solicitudes del índice geográfico (aceptadas, canceladas o expiradas)"""
+        HelperGeoIndex.remove_many(
+            cls.GEO_INDEX_SOLICITUDES,
+            [(s.id, s.origen_lat, s.origen_lng) for s in solicitudes]
+        )
+
+    @classmethod
+    def expirar_si_corresponde(cls):
+        """
+        Barrido de vencidas a lo sumo una vez cada EXPIRACION_INTERVAL entre todos los workers,
+        aprovechando las consultas del feed de conductores
+        """
+        try:
+            if cache.add(RedisKeys.TRANSPORT_SOLICITUD_EXPIRACION_LOCK, 1, cls.EXPIRACION_INTERVAL):
+                return cls.expirar_solicitudes()
+        except Exception as e:
+            # El feed filtra por fecha_expiracion; el próximo barrido reintenta
+            logger.error(f"Error al expirar solicitudes: {e}")
+        return 0
+
+    @classmethod
+    def expirar_solicitudes(cls, batch_size=None):
+        """
+        Pasa a 'expirada' las solicitudes pendientes vencidas en lotes acotados, las quita del
+        índice geográfico y notifica a sus suscriptores. Retorna la cantidad expirada.
+        """
+        batch_size = batch_size or cls.EXPIRACION_BATCH
+        total = 0
+        while True:
+            with transaction.atomic():
+                # Las filas bloqueadas por una aceptación en curso se dejan para el siguiente barrido
+                vencidas = list(
+                    SolicitudViaje.objects.select_for_update(skip_locked=True).filter(
+                        estado='pendiente',
+                        fecha_expiracion__lte=timezone.now()
+                    ).only('id', 'origen_lat', 'origen_lng').order_by('fecha_expiracion')[:batch_size]
+                )
+                if not vencidas:
+                    return total
+                SolicitudViaje.objects.filter(
+                    id__in=[s.id for s in vencidas], estado='pendiente'
+                ).update(estado='expirada')
+                for solicitud in vencidas:
+                    solicitud.estado = 'expirada'
+                    cls.publicar_estado(solicitud)
+                transaction.on_commit(lambda vencidas=vencidas: cls.desindexar_solicitudes(vencidas))
+            total += len(vencidas)
+            if len(vencidas) < batch_size:
+                return total
+
+    @staticmethod
+    def publicar_estado(solicitud, viaje_id=None):
+        """Notifica a los suscriptores de la solicitud su nuevo estado al confirmar la transacción"""
+        HelperEvents.publish_on_commit(
+            HelperEvents.channel(HelperEvents.SOLICITUD, solicitud.id),
+            'solicitud.estado',
+            {'id': solicitud.id, 'estado': solicitud.estado, 'viaje_id': viaje_id}
+        )
     
     def aceptar_solicitud(self, solicitud_id, conductor, moto_id=None):
-        """Un conductor acepta una solicitud de viaje"""
+        """Un conductor acepta una solicitud de viaje; entre aceptaciones simultáneas gana solo una"""
+        from security.models import Conductor, Moto
         try:
-            solicitud = SolicitudViaje.objects.get(id=solicitud_id, estado='pendiente')
-            
-            # Crear el viaje
-            viaje = Viaje.objects.create(
-                pasajero=solicitud.pasajero,
-                conductor=conductor,
-                origen_lat=solicitud.origen_lat,
-                origen_lng=solicitud.origen_lng,
-                origen_direccion=solicitud.origen_direccion,
-                destino_lat=solicitud.destino_lat,
-                destino_lng=solicitud.destino_lng,
-                destino_direccion=solicitud.destino_direccion,
-                precio_solicitado=solicitud.precio_solicitado,
-                metodo_pago=solicitud.metodo_pago,
-                estado='aceptado',
-                fecha_aceptacion=timezone.now()
-            )
+            moto = Moto.objects.get(id=moto_id, conductor=conductor) if moto_id else None
             
-            if moto_id:
-                from security.models import Moto
-                moto = Moto.objects.get(id=moto_id, conductor=conductor)
-                viaje.moto = moto
-                viaje.save()
+            with transaction.atomic():
+                # skip_locked: si otro conductor ya tiene la fila bloqueada se responde de inmediato
+                # en lugar de esperar su commit
+                solicitud = SolicitudViaje.objects.select_for_update(skip_locked=True).get(
+                    id=solicitud_id, estado='pendiente'
+                )
+                # Transición condicional: un único ganador también en motores sin bloqueo de filas
+                if not SolicitudViaje.objects.filter(id=solicitud.id, estado='pendiente').update(estado='aceptada'):
+                    raise SolicitudViaje.DoesNotExist
+                
+                # Crear el viaje
+                viaje = Viaje.objects.create(
+                    pasajero_id=solicitud.pasajero_id,
+                    conductor=conductor,
+                    moto=moto,
+                    origen_lat=solicitud.origen_lat,
+                    origen_lng=solicitud.origen_lng,
+                    origen_direccion=solicitud.origen_direccion,
+                    destino_lat=solicitud.destino_lat,
+                    destino_lng=solicitud.destino_lng,
+                    destino_direccion=solicitud.destino_direccion,
+                    precio_solicitado=solicitud.precio_solicitado,
+                    metodo_pago=solicitud.metodo_pago,
+                    estado='aceptado',
+                    fecha_aceptacion=timezone.now()
+                )
+                
+                # Enlazar el viaje creado a la solicitud
+                solicitud.estado = 'aceptada'
+                solicitud.viaje = viaje
+                SolicitudViaje.objects.filter(id=solicitud.id).update(viaje=viaje)
+                
+                # Actualizar estado del conductor a no disponible
+                Conductor.objects.filter(user=conductor).update(estado='en_viaje')
             
-            # Actualizar estado de la solicitud
-            solicitud.estado = 'aceptada'
-            solicitud.save()
-            
-            # Actualizar estado del conductor a no disponible
-            conductor.estado = 'en_viaje'
-            conductor.save()
+            transaction.on_commit(lambda: self.desindexar_solicitudes([solicitud]))
+            self.publicar_estado(solicitud, viaje_id=viaje.id)
             
             self.set_success(True)
             self.set_message('Solicitud aceptada')
@@ -178,6 +260,10 @@ class SolicitudViajeService(HelperService):
             self.set_success(False)
             self.set_message('Solicitud no encontrada o ya fue aceptada')
             return self
+        except Moto.DoesNotExist:
+            self.set_success(False)
+            self.set_message('Moto no encontrada')
+            return self
         except Exception as e:
             self.set_success(False)
             self.set_message(str(e))
@@ -189,6 +275,8 @@ class SolicitudViajeService(HelperService):
             solicitud = SolicitudViaje.objects.get(id=solicitud_id, pasajero=usuario)
             solicitud.estado = 'cancelada'
             solicitud.save()
+            transaction.on_commit(lambda: self.desindexar_solicitudes([solicitud]))
+            self.publicar_estado(solicitud)
             self.set_success(True)
             self.set_message('Solicitud cancelada')
             return self
@@ -4,6 +4,7 @@ from .viaje.views import ViajeView
 from .conductor.views import ConductorView
 from .moto.views import MotoView
 from .calificacion.views import CalificacionView
+from .eventos.views import eventos_solicitud, eventos_viaje, estado_solicitud
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -14,6 +15,10 @@ router.register(r'motos', MotoView, basename='api_v1_0_0_transport_motos')
 router.register(r'calificaciones', CalificacionView, basename='api_v1_0_0_transport_calificaciones')
 
 urlpatterns = [
+    re_path(r'^eventos/solicitudes/(?P<pk>\d+)/$', eventos_solicitud, name='api_v1_0_0_transport_eventos_solicitud'),
+    re_path(r'^eventos/viajes/(?P<pk>\d+)/$', eventos_viaje, name='api_v1_0_0_transport_eventos_viaje'),
+    # Antes del router: agrega long-polling (?wait=) a la acción estado de SolicitudViajeView
+    re_path(r'^solicitudes/(?P<pk>\d+)/estado/$', estado_solicitud, name='api_v1_0_0_transport_solicitudes_estado'),
     re_path(r'^', include(router.urls)),
 ]
 
@@ -5,71 +5,60 @@ from django.utils import timezone
 from django.db.models import Q
 from security.models import Viaje
 from helpers.response_helper import HelperResponse
+from helpers.cursor_helper import HelperCursor
+from helpers.location_cache_helper import HelperLocationCache
+from helpers.event_helper import HelperEvents
 from rest_framework import status
 
 
 class ViajeView(ViewSet):
     permission_classes = (IsAuthenticated,)
+    LIMITE_VIAJES = 50
+    LIMITE_MAXIMO_VIAJES = 100
+    TAMANO_EXPORTACION = 500
+
+    @staticmethod
+    def _publicar_estado(viaje):
+        """Notifica la transición a los suscriptores del canal de eventos del viaje"""
+        HelperEvents.publish_on_commit(
+            HelperEvents.channel(HelperEvents.VIAJE, viaje.id),
+            'viaje.estado',
+            {'id': viaje.id, 'estado': viaje.estado}
+        )
     
     @action(methods=['get'], detail=False)
     def mis_viajes(self, request):
-        """Obtiene los viajes del usuario (como pasajero o conductor)"""
+        """
+        Obtiene los viajes del usuario (como pasajero o conductor), del más reciente al más antiguo.
+        Parámetros: as=pasajero|conductor, limit y cursor (el valor 'siguiente' de la página anterior).
+        """
         try:
             import logging
             logger = logging.getLogger(__name__)
             
             usuario = request.user
-            logger.info(f"📋 Obteniendo viajes para usuario: {usuario.id} ({usuario.username})")
+            rol = request.query_params.get('as')
+            limit = HelperCursor.limite(
+                request.query_params.get('limit'), self.LIMITE_VIAJES, self.LIMITE_MAXIMO_VIAJES
+            )
             
-            # Obtener viajes donde el usuario es pasajero o conductor
-            viajes = Viaje.objects.filter(
-                Q(pasajero=usuario) | Q(conductor=usuario)
-            ).order_by('-fecha_solicitud')[:50]
+            viajes = self._consulta_viajes(usuario, rol)
             
-            logger.info(f"📋 Viajes encontrados: {viajes.count()}")
+            # Paginación por cursor sobre (fecha_solicitud, id): cada página es un rango del índice
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                viajes = viajes.filter(HelperCursor.filtro(cursor, 'fecha_solicitud'))
             
-            viajes_data = []
-            for v in viajes:
-                # Determinar el rol del usuario en este viaje
-                es_conductor = v.conductor == usuario if v.conductor else False
-                es_pasajero = v.pasajero == usuario
-                
-                viaje_dict = {
-                    'id': v.id,
-                    'estado': v.estado,  # Estado real de la base de datos
-                    'estado_display': v.get_estado_display(),  # Estado traducido (opcional)
-                    'origen': v.origen_direccion,
-                    'origen_direccion': v.origen_direccion,
-                    'destino': v.destino_direccion,
-                    'destino_direccion': v.destino_direccion,
-                    'precio': float(v.precio_solicitado),
-                    'precio_solicitado': float(v.precio_solicitado),
-                    'precio_final': float(v.precio_final) if v.precio_final else None,
-                    'fecha': v.fecha_solicitud.isoformat(),
-                    'metodo_pago': v.metodo_pago,
-                    'es_conductor': es_conductor,
-                    'es_pasajero': es_pasajero,
-                }
-                
-                logger.info(f"📋 Viaje {v.id}: estado={v.estado}, display={v.get_estado_display()}")
-                
-                # Agregar información del conductor si existe
-                if v.conductor:
-                    viaje_dict['conductor_id'] = v.conductor.id
-                    viaje_dict['conductor_nombre'] = f"{v.conductor.first_name} {v.conductor.last_name}"
-                
-                # Agregar información del pasajero
-                viaje_dict['pasajero_id'] = v.pasajero.id
-                viaje_dict['pasajero_nombre'] = f"{v.pasajero.first_name} {v.pasajero.last_name}"
-                
-                viajes_data.append(viaje_dict)
+            viajes = list(viajes[:limit + 1])
+            siguiente = HelperCursor.codificar(viajes[limit - 1].fecha_solicitud, viajes[limit - 1].id) if len(viajes) > limit else None
+            viajes_data = [self._viaje_dict(v, usuario) for v in viajes[:limit]]
             
-            logger.info(f"✅ Retornando {len(viajes_data)} viajes")
+            logger.info(f"📋 Retornando {len(viajes_data)} viajes para usuario {usuario.id}")
             
             response = HelperResponse()
             response.set_success(True)
             response.set_status(status.HTTP_200_OK)
-            response.set_data({'viajes': viajes_data})
+            response.set_data({'viajes': viajes_data, 'siguiente': siguiente})
             return response.to_dict()
         except Exception as e:
             import traceback
@@ -83,6 +72,80 @@ class ViajeView(ViewSet):
             response.set_status(status.HTTP_400_BAD_REQUEST)
             return response.to_dict()
     
+    @action(methods=['get'], detail=False)
+    def exportar(self, request):
+        """
+        Todos los viajes del usuario (as=pasajero|conductor), enviados por partes sin cargarlos
+        en memoria. Parámetro formato=json|ndjson.
+        """
+        response = HelperResponse()
+        try:
+            usuario = request.user
+            viajes = self._consulta_viajes(usuario, request.query_params.get('as'))
+            filas = viajes.iterator(chunk_size=self.TAMANO_EXPORTACION)
+            response.set_success(True)
+            response.set_status(status.HTTP_200_OK)
+            response.set_stream(
+                (self._viaje_dict(v, usuario) for v in filas),
+                stream_format=HelperResponse.get_stream_format(request),
+                filename='viajes'
+            )
+        except Exception as e:
+            response.set_success(False)
+            response.set_message(str(e))
+            response.set_status(status.HTTP_400_BAD_REQUEST)
+        return response.to_dict()
+    
+    @staticmethod
+    def _consulta_viajes(usuario, rol=None):
+        """Viajes del usuario como pasajero, conductor o ambos, solo con las columnas de _viaje_dict"""
+        if rol == 'pasajero':
+            filtro = Q(pasajero=usuario)
+        elif rol == 'conductor':
+            filtro = Q(conductor=usuario)
+        elif rol:
+            raise NameError("El parámetro 'as' debe ser 'pasajero' o 'conductor'")
+        else:
+            filtro = Q(pasajero=usuario) | Q(conductor=usuario)
+        
+        return Viaje.objects.filter(filtro).select_related('conductor', 'pasajero').only(
+            'id', 'estado', 'origen_direccion', 'destino_direccion', 'precio_solicitado',
+            'precio_final', 'fecha_solicitud', 'metodo_pago',
+            'conductor__id', 'conductor__first_name', 'conductor__last_name',
+            'pasajero__id', 'pasajero__first_name', 'pasajero__last_name',
+        ).order_by('-fecha_solicitud', '-id')
+    
+    @staticmethod
+    def _viaje_dict(v, usuario):
+        viaje_dict = {
+            'id': v.id,
+            'estado': v.estado,  # Estado real de la base de datos
+            'estado_display': v.get_estado_display(),  # Estado traducido (opcional)
+            'origen': v.origen_direccion,
+            'origen_direccion': v.origen_direccion,
+            'destino': v.destino_direccion,
+            'destino_direccion': v.destino_direccion,
+            # Decimal y datetime los codifica MyJSONRenderer
+            'precio': v.precio_solicitado,
+            'precio_solicitado': v.precio_solicitado,
+            'precio_final': v.precio_final or None,
+            'fecha': v.fecha_solicitud,
+            'metodo_pago': v.metodo_pago,
+            # Determinar el rol del usuario en este viaje
+            'es_conductor': v.conductor_id == usuario.id,
+            'es_pasajero': v.pasajero_id == usuario.id,
+        }
+        
+        # Agregar información del conductor si existe
+        if v.conductor_id:
+            viaje_dict['conductor_id'] = v.conductor_id
+            viaje_dict['conductor_nombre'] = f"{v.conductor.first_name} {v.conductor.last_name}"
+        
+        # Agregar información del pasajero
+        viaje_dict['pasajero_id'] = v.pasajero_id
+        viaje_dict['pasajero_nombre'] = f"{v.pasajero.first_name} {v.pasajero.last_name}"
+        return viaje_dict
+    
     @action(methods=['get'], detail=True)
     def detalle(self, request, pk=None):
         """Obtiene el detalle de un viaje específico"""
@@ -103,11 +166,16 @@ class ViajeView(ViewSet):
                 from security.models import Conductor
                 try:
                     conductor_profile = Conductor.objects.get(user=viaje.conductor)
+                    # Preferir la última posición en vivo sobre la persistida (que se actualiza por lotes)
+                    ubicacion = HelperLocationCache.get_location(conductor_profile.id)
                     conductor_data = {
                         'id': viaje.conductor.id,
                         'nombre': f"{viaje.conductor.first_name} {viaje.conductor.last_name}",
                         'calificacion': str(conductor_profile.calificacion_promedio) if conductor_profile.calificacion_promedio else '5.0',
                         'ubicacion_actual': {
+                            'lat': ubicacion['lat'],
+                            'lng': ubicacion['lng'],
+                        } if ubicacion else {
                             'lat': float(conductor_profile.ubicacion_actual_lat) if conductor_profile.ubicacion_actual_lat else None,
                             'lng': float(conductor_profile.ubicacion_actual_lng) if conductor_profile.ubicacion_actual_lng else None,
                         } if conductor_profile.ubicacion_actual_lat and conductor_profile.ubicacion_actual_lng else None,
@@ -166,6 +234,7 @@ class ViajeView(ViewSet):
             viaje = Viaje.objects.get(pk=pk, conductor=request.user)
             viaje.estado = 'en_camino_origen'
             viaje.save()
+            self._publicar_estado(viaje)
             
             response = HelperResponse()
             response.set_success(True)
@@ -192,6 +261,7 @@ class ViajeView(ViewSet):
             viaje = Viaje.objects.get(pk=pk, conductor=request.user)
             viaje.estado = 'llegado_origen'
             viaje.save()
+            self._publicar_estado(viaje)
             
             response = HelperResponse()
             response.set_success(True)
@@ -219,6 +289,7 @@ class ViajeView(ViewSet):
             viaje.estado = 'en_viaje'
             viaje.fecha_inicio = timezone.now()
             viaje.save()
+            self._publicar_estado(viaje)
             
             response = HelperResponse()
             response.set_success(True)
@@ -289,6 +360,7 @@ class ViajeView(ViewSet):
             viaje.estado = 'completado'
             viaje.fecha_finalizacion = timezone.now()
             viaje.save()
+            self._publicar_estado(viaje)
             
             # Actualizar estado del conductor a disponible
             from security.models import Conductor
@@ -337,6 +409,12 @@ class ViajeView(ViewSet):
             
             viaje.estado = 'cancelado'
             viaje.save()
+            self._publicar_estado(viaje)
+            
+            # Liberar al conductor que quedó en_viaje al aceptar la solicitud
+            if viaje.conductor_id:
+                from security.models import Conductor
+                Conductor.objects.filter(user_id=viaje.conductor_id, estado='en_viaje').update(estado='disponible')
             
             response = HelperResponse()
             response.set_success(True)
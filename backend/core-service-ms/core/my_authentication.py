@@ -1,3 +1,4 @@
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from security.models import CompanyBranch, Role
 from helpers.session_cache_helper import HelperSessionCache
@@ -10,52 +11,52 @@ class CustomJWTAuthentication(JWTAuthentication):
             return None
 
         user, token = result
+        jti = token.get('jti')
 
-        # Get session data from cache
-        session_data = HelperSessionCache.get_session(token.get('jti'))
+        # Get session data from cache (a single read)
+        session_data = HelperSessionCache.get_session(jti)
+        if session_data and session_data.get('revoked'):
+            raise AuthenticationFailed('La sesión fue cerrada', code='token_revoked')
 
-        if not session_data:
-            # Create new session if it doesn't exist
-            self._set_request_attributes_from_token(request, token)
+        if not session_data or self._session_needs_update(session_data, token):
+            # Create the session if it doesn't exist, or rebuild it with the new token data
             HelperSessionCache.create_session(user, token)
-            # Obtener los datos de sesión recién creados
-            session_data = HelperSessionCache.get_session(token.get('jti'))
+            session_data = HelperSessionCache.get_session(jti)
         else:
-            # Check if cached data needs to be updated
-            if self._session_needs_update(session_data, token):
-                # Update session with new token data
-                HelperSessionCache.delete_session(token.get('jti'))
-                self._set_request_attributes_from_token(request, token)
-                HelperSessionCache.create_session(user, token)
-                # Obtener los datos de sesión actualizados
-                session_data = HelperSessionCache.get_session(token.get('jti'))
-            else:
-                # Use cached session data
-                self._set_request_attributes_from_session(request, session_data)
+            # Extend session timeout only when it is close to expiring
+            HelperSessionCache.extend_session_if_due(jti, session_data)
 
-            # Extend session timeout
-            HelperSessionCache.extend_session(token.get('jti'))
+        self._set_request_attributes_from_session(request, session_data or {})
 
         request.user = user
         request.session_data = session_data or {}
 
         return (user, token)
 
-    def _set_request_attributes_from_token(self, request, token):
-        """Set request attributes from token data"""
-        branch_id = token.get("branch_id")
-        role_id = token.get("role_id")
-
-        request.branch = CompanyBranch.objects.filter(id=branch_id).first() if branch_id else None
-        request.role = Role.objects.filter(id=role_id).first() if role_id else None
-
     def _set_request_attributes_from_session(self, request, session_data):
-        """Set request attributes from session data"""
-        branch_data = session_data.get('branch')
-        role_data = session_data.get('role')
-
-        request.branch = CompanyBranch.objects.filter(id=branch_data.get('id')).first() if branch_data else None
-        request.role = Role.objects.filter(id=role_data.get('id')).first() if role_data else None
+        """Set request attributes from session data, without querying the database"""
+        request.branch = self._instance_from_dict(CompanyBranch, session_data.get('branch'))
+        request.role = self._instance_from_dict(Role, session_data.get('role'))
+
+    @staticmethod
+    def _instance_from_dict(model, data):
+        """Rebuild a model instance from its cached to_dict() representation"""
+        if not data:
+            return None
+        try:
+            instance = model(**{
+                field.attname: field.to_python(data[field.name])
+                for field in model._meta.concrete_fields
+                if field.name in data
+            })
+        except Exception:
+            try:
+                return model.objects.cached_get(id=data.get('id'))
+            except model.DoesNotExist:
+                return None
+        instance._state.adding = False
+        instance._state.db = model.objects.db
+        return instance
 
     def _session_needs_update(self, session_data, token):
         """Check if session data needs to be updated based on token"""
@@ -66,14 +67,9 @@ class CustomJWTAuthentication(JWTAuthentication):
         token_branch_id = token.get('branch_id')
         token_role_id = token.get('role_id')
 
-        # Debug logging (puedes remover esto después)
-        print(f"Cache - Branch: {cached_branch_id}, Role: {cached_role_id}")
-        print(f"Token - Branch: {token_branch_id}, Role: {token_role_id}")
-        print(f"Needs update: {cached_branch_id != token_branch_id or cached_role_id != token_role_id}")
-
         # Check if any critical field has changed
         return (cached_branch_id != token_branch_id or
                 cached_role_id != token_role_id)
 
     def authenticate_header(self, request):
-        return super().authenticate_header(request)
\ No newline at end of file
+        return super().authenticate_header(request)
@@ -124,15 +124,15 @@ MY_REST_FRAMEWORK = {
     'DATE_FORMAT': '%Y-%m-%d',
     'TIME_INPUT_FORMATS': ['%H:%M:%S', '%I:%M:%S'],
     'TIME_FORMAT': '%H:%M:%S',
+    # La interfaz navegable de DRF solo en desarrollo
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
-    ),
+        'core.my_renderers.MyJSONRenderer',
+    ) + (('rest_framework.renderers.BrowsableAPIRenderer',) if MY_DEBUG else ()),
     'DEFAULT_METADATA_CLASS': (
         'rest_framework.metadata.SimpleMetadata'
     ),
     'DEFAULT_PARSER_CLASSES': (
-        'rest_framework.parsers.JSONParser',
+        'core.my_renderers.MyJSONParser',
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ),
@@ -275,6 +275,33 @@ MY_DECIMAL_PLACES = 4
 
 MY_USER_SYSTEM_ID = 1
 MY_CACHE_LIFETIME = 3600
+# Cache local por proceso delante de Redis: vigencia máxima de una entrada y cantidad de entradas
+MY_CACHE_L1_TTL = 30
+MY_CACHE_L1_MAX_ENTRIES = 5000
+
+# Ubicación en vivo de conductores: vigencia de la última posición y cada cuánto se persiste en BD
+MY_UBICACION_TTL = 300
+MY_UBICACION_FLUSH_INTERVAL = 15
+MY_UBICACION_FLUSH_BATCH = 500
+
+# Barrido de solicitudes de viaje vencidas: cada cuánto se ejecuta como máximo y tamaño de lote
+MY_SOLICITUD_EXPIRACION_INTERVAL = 30
+MY_SOLICITUD_EXPIRACION_BATCH = 500
+
+# Solicitudes cercanas: radio máximo de búsqueda (km) y celdas del índice geográfico leídas por consulta;
+# con más celdas (cerca de los polos) se filtra en BD por rectángulo
+MY_SOLICITUD_RADIO_MAXIMO_KM = 50
+MY_GEO_INDEX_MAX_CELDAS = 1000
+# Conductores cercanos: radio máximo de búsqueda (km) del rectángulo previo a Haversine
+MY_CONDUCTOR_RADIO_MAXIMO_KM = 50
+
+# Puntaje reciente de calificaciones: días en que el peso de una calificación cae a la mitad (0 lo desactiva)
+MY_CALIFICACION_VIDA_MEDIA_DIAS = 90
+
+# Conteo de MyManager.datatable: vigencia del conteo en cache (count='cached') y cantidad de filas bajo la
+# cual la estimación del planificador (count='estimate') se reemplaza por un COUNT exacto
+MY_DATATABLE_COUNT_TTL = 60
+MY_DATATABLE_EXACT_COUNT_BELOW = 10000
 
 MY_FIELDS_AUDIT = ['created_by', 'created_at', 'updated_by', 'updated_at', 'is_active']
 MY_ADMIN_URL = 'console/'
@@ -1,13 +1,45 @@
-from django.core import serializers
+import json
+import logging
+import os
+import pickle
+import socket
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from django.core.cache import cache
 
-from core.my_base import MY_TITLE_SYSTEM_KEY, MY_CACHE_LIFETIME
+from core.my_base import MY_TITLE_SYSTEM_KEY, MY_CACHE_LIFETIME, MY_CACHE_L1_TTL, MY_CACHE_L1_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
 
 
 class MyRedis:
     PREFIX = f"{MY_TITLE_SYSTEM_KEY}".lower().strip()
     SUFFIX = "api"
 
+    @staticmethod
+    def connection(alias='default'):
+        """Cliente Redis crudo del cache configurado, o None si el backend no es django_redis"""
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection(alias)
+        except (ImportError, NotImplementedError):
+            return None
+
+    @staticmethod
+    def async_connection(alias='default'):
+        """Cliente asyncio de Redis con la misma configuración del cache, o None si no es django_redis"""
+        from django.conf import settings
+        config = settings.CACHES.get(alias, {})
+        if not config.get('BACKEND', '').startswith('django_redis'):
+            return None
+        import redis.asyncio
+        return redis.asyncio.Redis.from_url(
+            config['LOCATION'],
+            password=config.get('OPTIONS', {}).get('PASSWORD')
+        )
+
 
 class RedisKeys:
     # SYSTEM_PROFILE = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:{{}}:system_profile:{{}}:{{}}"
@@ -18,6 +50,233 @@ class RedisKeys:
     # MODULE = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:{{}}:module:{{}}:{{}}"
     # MODULE_PROFILES = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:{{}}:module:{{}}:{{}}:profiles"
     # MODULE_PERMISSIONS = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:{{}}:module:{{}}:{{}}:permissions"
+    TRANSPORT_UBICACION = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:transport:ubicacion:{{}}"
+    TRANSPORT_UBICACION_PENDIENTES = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:transport:ubicacion:pendientes"
+    TRANSPORT_UBICACION_FLUSH_LOCK = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:transport:ubicacion:flush_lock"
+    TRANSPORT_SOLICITUD_EXPIRACION_LOCK = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:transport:solicitud:expiracion_lock"
+    GEO_INDEX_CELDA = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:geo:{{}}:celda:{{}}:{{}}"
+    CACHE_INVALIDACION = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:cache:invalidacion"
+    MENU_VERSION = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:menu:version:{{}}"
+    MENU_ESTRUCTURA = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:menu:{{}}:profile:{{}}:{{}}"
+    PERMISOS_PERFIL = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:permisos:profile:{{}}:{{}}"
+    DATATABLE_COUNT = f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:datatable:{{}}:count:{{}}"
+
+
+class MyLocalCache:
+    """
+    Bounded per-process LRU/TTL tier in front of the shared cache.
+    Writes made through MY_Cache or HelperSessionCache publish the key on Redis pub/sub so
+    every other worker evicts its copy; TTL bounds staleness if a message is lost.
+    Values are stored pickled, so callers never share mutable objects.
+    """
+    TTL = MY_CACHE_L1_TTL
+    MAX_ENTRIES = MY_CACHE_L1_MAX_ENTRIES
+    _lock = threading.Lock()
+    _entries = OrderedDict()
+    _counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+    _listener = None
+    _listener_pid = None
+
+    @staticmethod
+    def _origin():
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    @classmethod
+    def get(cls, key, default=None):
+        cls._ensure_listener()
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None:
+                cls._counters['misses'] += 1
+                return default
+            expires_at, payload = entry
+            if expires_at <= now:
+                del cls._entries[key]
+                cls._counters['misses'] += 1
+                cls._counters['evictions'] += 1
+                return default
+            cls._entries.move_to_end(key)
+            cls._counters['hits'] += 1
+        return pickle.loads(payload)
+
+    @classmethod
+    def contains(cls, key):
+        with cls._lock:
+            entry = cls._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    @classmethod
+    def set(cls, key, value, ttl=None):
+        cls._ensure_listener()
+        ttl = min(ttl or cls.TTL, cls.TTL)
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with cls._lock:
+            cls._entries[key] = (time.monotonic() + ttl, payload)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls.MAX_ENTRIES:
+                cls._entries.popitem(last=False)
+                cls._counters['evictions'] += 1
+
+    @classmethod
+    def evict(cls, *keys):
+        with cls._lock:
+            for key in keys:
+                if cls._entries.pop(key, None) is not None:
+                    cls._counters['invalidations'] += 1
+
+    @classmethod
+    def invalidate(cls, *keys):
+        """
+        Evict keys here and in every other worker. Call it after the write or delete in the
+        shared cache, never before: a worker could otherwise reload the old value in between
+        """
+        cls.evict(*keys)
+        try:
+            connection = MyRedis.connection()
+            if connection is not None:
+                connection.publish(
+                    RedisKeys.CACHE_INVALIDACION,
+                    json.dumps({'origen': cls._origin(), 'claves': list(keys)})
+                )
+        except Exception as e:
+            logger.error(f"Error publicando invalidación de cache: {e}")
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._entries.clear()
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            return dict(cls._counters, size=len(cls._entries), max_entries=cls.MAX_ENTRIES,
+                        ttl=cls.TTL, pid=os.getpid(),
+                        listener=cls._listener is not None and cls._listener.is_alive())
+
+    @classmethod
+    def _ensure_listener(cls):
+        """
+        Start (or restart after a fork or a dropped connection) the invalidation subscriber
+        """
+        listener = cls._listener
+        if cls._listener_pid == os.getpid() and (listener is None or listener.is_alive()):
+            return
+        with cls._lock:
+            if cls._listener_pid == os.getpid() and (cls._listener is None or cls._listener.is_alive()):
+                return
+            # Entries cached while no listener was running may have missed invalidations
+            cls._entries.clear()
+            cls._listener = None
+            cls._listener_pid = os.getpid()
+            try:
+                connection = MyRedis.connection()
+                if connection is None:
+                    # Sin Redis no hay otros procesos que invalidar; solo aplica el TTL
+                    return
+                pubsub = connection.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{RedisKeys.CACHE_INVALIDACION: cls._on_invalidation})
+                cls._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+            except Exception as e:
+                # Se reintenta en el siguiente acceso; mientras tanto las entradas vencen por TTL
+                cls._listener_pid = None
+                logger.error(f"Error suscribiendo invalidaciones de cache: {e}")
+
+    @classmethod
+    def _on_invalidation(cls, message):
+        try:
+            data = json.loads(message['data'])
+        except (TypeError, ValueError):
+            return
+        if data.get('origen') != cls._origin():
+            cls.evict(*data.get('claves', []))
+
+
+class MyModelCodec:
+    """
+    Compact encoding of model rows for the cache: (model label, schema version, field values)
+    in concrete-field order. Rows cached under another schema version decode as a miss.
+    """
+    _versions = {}
+
+    @classmethod
+    def version(cls, model):
+        label = model._meta.label
+        version = cls._versions.get(label)
+        if version is None:
+            schema = repr([(field.attname, field.get_internal_type()) for field in model._meta.concrete_fields])
+            version = cls._versions[label] = zlib.crc32(schema.encode())
+        return version
+
+    @classmethod
+    def encode(cls, instance):
+        """
+        Returns None for instances with deferred fields, which cannot be cached whole
+        """
+        from django.db.models.fields.files import FieldFile
+
+        if instance.get_deferred_fields():
+            return None
+        values = []
+        for field in instance._meta.concrete_fields:
+            value = getattr(instance, field.attname)
+            values.append(value.name if isinstance(value, FieldFile) else value)
+        model = type(instance)
+        return model._meta.label, cls.version(model), tuple(values)
+
+    @classmethod
+    def decode(cls, payload):
+        from django.apps import apps
+        from django.db import router
+
+        try:
+            label, version, values = payload
+            model = apps.get_model(label)
+        except (TypeError, ValueError, LookupError):
+            return None
+        if version != cls.version(model):
+            return None
+        return model.from_db(
+            router.db_for_read(model),
+            [field.attname for field in model._meta.concrete_fields],
+            values
+        )
+
+
+class MySingleFlight:
+    """
+    Lets a single caller rebuild a missing cache entry while concurrent callers for the
+    same key wait for it: threads of this process through striped locks, other workers
+    through a short-lived lock key in the shared cache.
+    """
+    LOCK_TIMEOUT = 10
+    WAIT = 2.0
+    POLL = 0.05
+    _locks = [threading.Lock() for _ in range(64)]
+
+    @classmethod
+    def do(cls, key, load, cached):
+        """
+        `cached()` returns the current cached value or None; `load()` rebuilds and stores it
+        """
+        with cls._locks[hash(key) % len(cls._locks)]:
+            value = cached()
+            if value is not None:
+                return value
+            lock_key = f"{key}:lock"
+            if cache.add(lock_key, 1, cls.LOCK_TIMEOUT):
+                try:
+                    return load()
+                finally:
+                    cache.delete(lock_key)
+            deadline = time.monotonic() + cls.WAIT
+            while time.monotonic() < deadline:
+                time.sleep(cls.POLL)
+                value = cached()
+                if value is not None:
+                    return value
+            # The other worker did not finish in time; load without waiting any longer
+            return load()
 
 
 class MY_Cache:
@@ -27,32 +286,91 @@ class MY_Cache:
         self.lifetime = lifetime
 
     def has_key(self):
-        return cache.has_key(self.key)
+        return MyLocalCache.contains(self.key) or cache.has_key(self.key)
 
     def get(self):
-        return cache.get(self.key)
+        data = MyLocalCache.get(self.key)
+        if data is None:
+            data = cache.get(self.key)
+            if data is not None:
+                MyLocalCache.set(self.key, data, self.lifetime)
+        return data
 
     def set(self, data):
         cache.set(self.key, data, self.lifetime)
+        MyLocalCache.invalidate(self.key)
+        MyLocalCache.set(self.key, data, self.lifetime)
 
     # Recuperar el objeto desde caché
     def get_model_object(self):
         cached_data = self.get()
         if cached_data:
-            try:
-                for deserialized in serializers.deserialize('json', cached_data):
-                    return deserialized.object  # Devuelve la instancia del modelo
-            except Exception as e:
-                # Podrías hacer logging del error aquí
-                return None
+            return MyModelCodec.decode(cached_data)
         return None
 
     # Almacenar un objeto modelo en caché
     def set_model_object(self, instance):
         if instance:
-            serialized_data = serializers.serialize('json', [instance])
-            cache.set(self.key, serialized_data, self.lifetime)
+            payload = MyModelCodec.encode(instance)
+            if payload is not None:
+                self.set(payload)
+
+    @staticmethod
+    def get_many(keys):
+        """
+        Values of several keys: local tier first, the rest in one round trip to the shared cache
+        """
+        found = {}
+        missing = []
+        for key in keys:
+            data = MyLocalCache.get(key)
+            if data is None:
+                missing.append(key)
+            else:
+                found[key] = data
+        if missing:
+            fetched = cache.get_many(missing)
+            for key, data in fetched.items():
+                MyLocalCache.set(key, data)
+            found.update(fetched)
+        return found
+
+    @staticmethod
+    def set_many(mapping, lifetime=MY_CACHE_LIFETIME):
+        """
+        Store several keys in one round trip to the shared cache
+        """
+        if not mapping:
+            return
+        cache.set_many(mapping, lifetime)
+        MyLocalCache.invalidate(*mapping.keys())
+        for key, data in mapping.items():
+            MyLocalCache.set(key, data, lifetime)
+
+    @classmethod
+    def get_model_objects(cls, keys):
+        """
+        Instances cached under several keys; keys without a valid row are omitted
+        """
+        objects = {}
+        for key, data in cls.get_many(keys).items():
+            instance = MyModelCodec.decode(data)
+            if instance is not None:
+                objects[key] = instance
+        return objects
+
+    @classmethod
+    def set_model_objects(cls, instances, lifetime=MY_CACHE_LIFETIME):
+        """
+        Cache several instances given as {key: instance}
+        """
+        payloads = {}
+        for key, instance in instances.items():
+            payload = MyModelCodec.encode(instance) if instance else None
+            if payload is not None:
+                payloads[key] = payload
+        cls.set_many(payloads, lifetime)
 
     def delete(self):
-        if self.has_key():
-            cache.delete(self.key)
+        cache.delete(self.key)
+        MyLocalCache.invalidate(self.key)
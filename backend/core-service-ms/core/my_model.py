@@ -1,21 +1,76 @@
 # -*- coding: utf-8 -*-
 from __future__ import division
+import hashlib
+import json
 import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 # from cgi import escape
 from datetime import datetime, date, time, timedelta
 from decimal import Decimal, ROUND_HALF_UP, ROUND_DOWN, ROUND_UP, InvalidOperation
-from django.db.models import Q, JSONField
+from django.db.models import F, Q, JSONField
 from django.contrib.admin.utils import NestedObjects
-from django.db import transaction, router, models
-from core.my_cache import MY_Cache, MyRedis
-from django.core.exceptions import FieldDoesNotExist
+from django.core.cache import cache
+from django.db import connections, transaction, router, models
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from core.my_cache import MY_Cache, MyRedis, MySingleFlight, RedisKeys
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
 from django.db.models.fields.files import FileField
 from django.db.models.fields.related import ForeignKey, ManyToManyField, OneToOneField
-from core.my_base import MY_CACHE_LIFETIME, MY_USER_SYSTEM_ID, MY_DECIMAL_PLACES
+from core.my_base import (MY_CACHE_LIFETIME, MY_USER_SYSTEM_ID, MY_DECIMAL_PLACES, MY_DATATABLE_COUNT_TTL,
+                          MY_DATATABLE_EXACT_COUNT_BELOW)
 
 
 class MyManager(models.Manager):
 
+    def cached_get(self, **lookup):
+        """
+            Read-through get by primary key or a unique field, backed by the shared cache.
+            Rows are cached by id; unique fields map to the id. Entries are invalidated on
+            post_save/post_delete and concurrent misses of a key hit the database only once.
+
+            Raises Model.DoesNotExist like get().
+        """
+        if len(lookup) != 1:
+            raise NameError("cached_get admite un único campo de búsqueda")
+        field, value = next(iter(lookup.items()))
+        field = self.model._meta.pk.name if field == 'pk' else field
+        model_field = self.model._meta.get_field(field)
+        if not (model_field.primary_key or model_field.unique):
+            raise NameError(f"El campo '{field}' no es único en el modelo")
+
+        if model_field.primary_key:
+            instance = self._cached_by_id(value)
+        else:
+            pointer = self.model.cache(value, field)
+            instance_id = pointer.get()
+            try:
+                instance = self._cached_by_id(instance_id) if instance_id is not None else None
+            except self.model.DoesNotExist:
+                instance = None
+            # El puntero puede ser de un valor que la fila ya no tiene
+            if instance is not None and getattr(instance, model_field.attname) != model_field.to_python(value):
+                instance = None
+            if instance is None:
+                instance = self.get(**{field: value})
+                self.model.cache(instance.pk).set_model_object(instance)
+                pointer.set(instance.pk)
+        return instance
+
+    def _cached_by_id(self, value):
+        e_cache = self.model.cache(value)
+
+        def load():
+            instance = self.get(pk=value)
+            e_cache.set_model_object(instance)
+            return instance
+
+        return MySingleFlight.do(e_cache.key, load, e_cache.get_model_object)
+
+
+    DATATABLE_COUNTS = ('exact', 'estimate', 'cached')
+
     def datatable(self, **kwargs):
         """
             Fetches data based on filters, ordering, and pagination.
@@ -26,9 +81,19 @@ class MyManager(models.Manager):
                 - conditions (Q object, optional): Filters to apply to the query.
                 - limit (int, optional): The maximum number of records to return.
                 - offset (int, optional): The number of records to skip before starting to return records.
-                - order_by (str or list of str, optional): Fields to order the results by.
+                - order_by (str or list of str, optional): Fields to order the results by. The primary key
+                  is appended as a tiebreaker so every row has a stable position. A ForeignKey orders
+                  by its id, and NULLs of nullable fields sort as the greatest value (last ascending,
+                  first descending) on every database.
                 - exclude (Q object, optional): Filters to exclude from the query.
                 - annotate (dict, optional): Annotations to apply to the query.
+                - cursor (str, optional): Keyset pagination. Returns the rows after the cursor built by
+                  datatable_cursor() for the last row of the previous page; offset is ignored.
+                - count (str, optional): 'exact' (default) runs COUNT; 'estimate' uses the PostgreSQL
+                  planner estimate when it is above MY_DATATABLE_EXACT_COUNT_BELOW; 'cached' keeps the
+                  exact count of the same query for MY_DATATABLE_COUNT_TTL seconds.
+                - distinct (bool, optional): Forces DISTINCT on or off. By default it is applied only
+                  when a filter or ordering joins a multi-valued relation that can repeat rows.
 
             Returns:
             tuple: A tuple containing:
@@ -42,39 +107,216 @@ class MyManager(models.Manager):
         order_by = kwargs.get('order_by', None)
         exclude = kwargs.get('exclude', Q())
         annotate = kwargs.get('annotate', None)
+        cursor = kwargs.get('cursor', None)
+        count = kwargs.get('count', 'exact')
+        distinct = kwargs.get('distinct', None)
+        if count not in self.DATATABLE_COUNTS:
+            raise NameError(f"Tipo de conteo no soportado: {count}")
+
         # Aplicar conditions
-        query = self.filter(conditions).exclude(exclude).distinct()
+        query = self.filter(conditions).exclude(exclude)
 
         # Aplicar anotaciones si se proporcionan
         if annotate is not None:
             query = query.annotate(**annotate)
 
-        # Contar el total de registros
-        iTotalRecords = query.count()
-
         # Ordenar los registros
-        if order_by is not None:
-            if isinstance(order_by, (list, tuple)):
-                query = query.order_by(*order_by)
-            else:
-                query = query.order_by(order_by)
-        else:
-            query = query.order_by('id')
-
-        # Aplicar paginación
-        if offset is not None:
-            query = query[offset:]
+        ordering = self._datatable_ordering(order_by)
+        query = query.order_by(*self._datatable_order_expressions(ordering))
+
+        # DISTINCT solo cuando algún JOIN puede repetir filas
+        if distinct or (distinct is None and self._datatable_repeats_rows(query, ordering)):
+            query = query.distinct()
+
+        # Aplicar paginación: por cursor es un rango del índice, por offset recorre las filas saltadas
+        page = query
+        if cursor:
+            page = page.filter(self._datatable_keyset(ordering, cursor))
+        elif offset:
+            page = page[offset:]
         if limit is not None:
-            query = query[:limit]
+            page = page[:limit]
+
+        # Obtener los datos
+        aData = list(page)
 
         # Contar los registros que serán mostrados
-        iTotalDisplayRecords = len(query)
+        iTotalDisplayRecords = len(aData)
 
-        # Obtener los datos
-        aData = list(query)
+        # Contar el total de registros; si la página quedó incompleta el total ya se conoce
+        if not cursor and (limit is None or iTotalDisplayRecords < limit) and (iTotalDisplayRecords or not offset):
+            iTotalRecords = (offset or 0) + iTotalDisplayRecords
+        else:
+            iTotalRecords = self._datatable_count(query, count)
 
         return aData, iTotalRecords, iTotalDisplayRecords
 
+    def datatable_cursor(self, instance, order_by=None):
+        """
+            Cursor for datatable(cursor=...) pointing right after instance, usually the last row
+            of the current page, with the same order_by given to datatable().
+        """
+        values = []
+        for name, _, _ in self._datatable_fields(self._datatable_ordering(order_by)):
+            value = instance
+            for part in name.split(LOOKUP_SEP):
+                try:
+                    value = getattr(value, self.model._meta.pk.attname if part == 'pk' else part)
+                except ObjectDoesNotExist:
+                    value = None
+                if value is None:
+                    break
+            values.append(value)
+        return urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+    def _datatable_ordering(self, order_by):
+        if order_by is None:
+            ordering = []
+        elif isinstance(order_by, (list, tuple)):
+            ordering = list(order_by)
+        else:
+            ordering = [order_by]
+        pk_names = {'pk', self.model._meta.pk.name, self.model._meta.pk.attname}
+        if not any(isinstance(name, str) and name.lstrip('-') in pk_names for name in ordering):
+            ordering.append('id' if 'id' in pk_names else 'pk')
+        return ordering
+
+    def _datatable_fields(self, ordering):
+        """
+            (lookup, descending, nullable) of each ordering name. A ForeignKey at the end of the
+            path becomes its attname (company -> company_id); a path through a nullable relation
+            or an annotation counts as nullable.
+        """
+        fields = []
+        for name in ordering:
+            if not isinstance(name, str):
+                raise NameError('La paginación por cursor requiere ordenar por nombres de campo')
+            descending = name.startswith('-')
+            parts = name.lstrip('-').split(LOOKUP_SEP)
+            opts = self.model._meta
+            nullable = False
+            for index, part in enumerate(parts):
+                if part == 'pk':
+                    field = opts.pk
+                else:
+                    try:
+                        field = opts.get_field(part)
+                    except FieldDoesNotExist:
+                        nullable = True
+                        break
+                nullable = nullable or field.null
+                if not field.is_relation:
+                    break
+                if index == len(parts) - 1:
+                    if field.concrete:
+                        parts[index] = field.attname
+                else:
+                    opts = field.related_model._meta
+            fields.append((LOOKUP_SEP.join(parts), descending, nullable))
+        return fields
+
+    def _datatable_order_expressions(self, ordering):
+        expressions = []
+        for name in ordering:
+            if not isinstance(name, str) or name == '?':
+                expressions.append(name)
+                continue
+            lookup, descending, nullable = self._datatable_fields([name])[0]
+            if nullable:
+                # NULL como el mayor valor en cualquier motor, igual que el filtro por cursor
+                expressions.append(F(lookup).desc(nulls_first=True) if descending else F(lookup).asc(nulls_last=True))
+            else:
+                expressions.append(f"-{lookup}" if descending else lookup)
+        return expressions
+
+    def _datatable_keyset(self, ordering, cursor):
+        """
+            Rows after the cursor in the given ordering: (a > x) or (a = x and b > y) or ...,
+            with < for the descending fields. NULL is the greatest value, so 'a > x' also
+            matches NULLs and 'after NULL' descending is IS NOT NULL.
+        """
+        try:
+            values = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, TypeError, AttributeError):
+            raise NameError('Cursor inválido')
+        if not isinstance(values, list) or len(values) != len(ordering):
+            raise NameError('Cursor inválido')
+
+        condition = Q()
+        equal = Q()
+        for (lookup, descending, nullable), value in zip(self._datatable_fields(ordering), values):
+            if value is None:
+                after = Q(**{f'{lookup}__isnull': False}) if descending else None
+                same = Q(**{f'{lookup}__isnull': True})
+            else:
+                after = Q(**{f"{lookup}__{'lt' if descending else 'gt'}": value})
+                if nullable and not descending:
+                    after |= Q(**{f'{lookup}__isnull': True})
+                same = Q(**{lookup: value})
+            if after is not None:
+                condition |= equal & after
+            equal &= same
+        return condition
+
+    @staticmethod
+    def _datatable_repeats_rows(query, ordering):
+        """
+            True when a JOIN of the filters or the ordering follows a reverse ForeignKey or a
+            ManyToMany, so a row of the model can appear more than once
+        """
+        if query.query.group_by is not None:
+            return False
+        for join in query.query.alias_map.values():
+            field = getattr(join, 'join_field', None)
+            if field is not None and (field.one_to_many or field.many_to_many):
+                return True
+        for name in ordering:
+            if not isinstance(name, str):
+                continue
+            opts = query.model._meta
+            for part in name.lstrip('-').split(LOOKUP_SEP):
+                try:
+                    field = opts.get_field(part)
+                except FieldDoesNotExist:
+                    break
+                if field.one_to_many or field.many_to_many:
+                    return True
+                if not field.is_relation:
+                    break
+                opts = field.related_model._meta
+        return False
+
+    def _datatable_count(self, query, mode):
+        query = query.order_by()
+        if mode == 'estimate':
+            estimate = self._estimated_count(query)
+            if estimate is not None and estimate >= MY_DATATABLE_EXACT_COUNT_BELOW:
+                return estimate
+        elif mode == 'cached':
+            sql, params = query.query.sql_with_params()
+            digest = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+            key = RedisKeys.DATATABLE_COUNT.format(self.model._meta.label_lower, digest)
+            total = cache.get(key)
+            if total is None:
+                total = query.count()
+                cache.set(key, total, MY_DATATABLE_COUNT_TTL)
+            return total
+        return query.count()
+
+    @staticmethod
+    def _estimated_count(query):
+        """Rows estimated by the PostgreSQL planner for the query; None on other databases"""
+        connection = connections[query.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = query.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
 
 class MyDecimalRoundMixin:
 
@@ -176,12 +418,12 @@ class MyModel(models.Model, MyDecimalRoundMixin):
         key = f"{MyRedis.PREFIX}:table:{table}:{field}:{normalized_value}"
         return MY_Cache(key=key, lifetime=lifetime)
 
-    def delete_cache(self, value, field='id'):
+    def delete_cache(self, value=None, field='id'):
         try:
             self._meta.get_field(field)
-            field_value = getattr(self, field)
+            field_value = value if value is not None else getattr(self, field)
             if field_value:
-                eCache = self.cache(self, field, field_value)
+                eCache = self.cache(field_value, field)
                 eCache.delete()
         except FieldDoesNotExist:
             raise NameError(f"El campo '{field}' no existe en el modelo")
@@ -361,3 +603,13 @@ class MyModel(models.Model, MyDecimalRoundMixin):
             self.created_by_id = user_ if user_ else MY_USER_SYSTEM_ID
             self.created_at = now
         models.Model.save(self)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_model_cache(sender, instance, **kwargs):
+    """Drops the cached row of any MyModel written or deleted, once the transaction commits"""
+    if isinstance(instance, MyModel) and instance.pk is not None and not kwargs.get('raw'):
+        # post_delete deja la pk en None antes del commit: se captura ahora
+        pk = instance.pk
+        transaction.on_commit(lambda: instance.delete_cache(pk), using=kwargs.get('using'))
@@ -0,0 +1,25 @@
+from rest_framework.permissions import BasePermission
+from helpers.permission_helper import HelperPermission
+
+
+class ModulePermission(BasePermission):
+    """
+    Requires a permission of the module declared by the view, evaluated in memory with the
+    cached PermissionEvaluator of the session profile (see HelperPermission.for_request).
+
+        permission_classes = (IsAuthenticated, ModulePermission)
+        module_code = 'viajes'
+        module_permissions = {'create': 'can_add', 'destroy': 'can_delete'}  # default: can_access
+    """
+    message = 'No tiene permiso para acceder a este módulo'
+
+    def has_permission(self, request, view):
+        module_code = getattr(view, 'module_code', None)
+        if not module_code:
+            return True
+        evaluator = HelperPermission.for_request(request)
+        if evaluator is None:
+            return False
+        action = getattr(view, 'action', None) or request.method.lower()
+        code = getattr(view, 'module_permissions', {}).get(action, HelperPermission.ACCESS)
+        return evaluator.has_module_permission(module_code, code)
@@ -0,0 +1,56 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+orjson serializes datetime, date, time and UUID natively. Anything else it does not
+know (Decimal, lazy strings, querysets, timedelta...) goes through DRF's JSONEncoder.
+The output is therefore the same as the stock JSONRenderer: Decimal as a number and
+UTC datetimes with 'Z'. Services can return model values as they are, without
+float()/str()/isoformat() per field. Without orjson both classes fall back to the
+DRF implementation.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data, indent=False):
+    """bytes with the JSON of data; the same encoding the API responses use"""
+    if orjson is None:
+        return _encoder.encode(data).encode('utf-8')
+    option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=_encoder.default, option=option)
+
+
+class MyJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        return dumps(data, indent=bool(indent))
+
+
+class MyJSONParser(JSONParser):
+    renderer_class = MyJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
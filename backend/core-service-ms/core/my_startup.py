@@ -0,0 +1,112 @@
+"""
+Cold-start profiling of the service.
+
+Running this module in a fresh interpreter (python -X importtime -m core.my_startup) boots
+Django phase by phase the same way a worker does and prints the time of each phase as JSON;
+the interpreter writes the import tree to stderr. The perfilar_arranque command launches it
+and builds the report, so the measured process never has Django already loaded.
+"""
+import json
+import os
+import sys
+import time
+
+
+class MyStartupProfiler:
+    SCHEMA_PATH = '/api/security/swagger/v1.0.0/?format=openapi'
+
+    def __init__(self):
+        self.phases = []
+
+    def measure(self, name, function, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.phases.append({'name': name, 'ms': (time.perf_counter() - start) * 1000})
+
+    def _timed_ready(self, app_config):
+        ready = app_config.ready
+
+        def timed():
+            self.measure(f"ready:{app_config.label}", ready)
+
+        app_config.ready = timed
+
+    def run(self, schema=True):
+        """
+        Boot phases of a worker: settings, app registry (imports + ready() of each app),
+        URL conf, ASGI handler and, optionally, the drf_yasg schema
+        """
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server.settings')
+        import importlib
+        import django
+        from django.apps import AppConfig
+        from django.conf import settings
+
+        self.measure('settings', importlib.import_module, os.environ['DJANGO_SETTINGS_MODULE'])
+        self.measure('settings:configure', settings._setup)
+
+        create = AppConfig.create
+
+        def create_timed(entry):
+            app_config = create(entry)
+            self._timed_ready(app_config)
+            return app_config
+
+        AppConfig.create = staticmethod(create_timed)
+        try:
+            self.measure('django.setup', django.setup, set_prefix=False)
+        finally:
+            AppConfig.create = staticmethod(create)
+
+        from django.urls import get_resolver
+        resolver = get_resolver()
+        self.measure('urlconf', lambda: resolver.url_patterns)
+        self.measure('urlconf:reverse', lambda: resolver.reverse_dict)
+
+        from django.core.asgi import get_asgi_application
+        self.measure('asgi', get_asgi_application)
+
+        if schema:
+            self.measure('swagger:schema', self._schema)
+        return self.phases
+
+    def _schema(self):
+        from django.test import RequestFactory
+        from api.urls import schema_view_v1_0_0
+        request = RequestFactory().get(self.SCHEMA_PATH, HTTP_HOST='localhost')
+        response = schema_view_v1_0_0.without_ui(cache_timeout=0)(request)
+        response.render()
+        return response
+
+    @staticmethod
+    def parse_importtime(output):
+        """
+        Modules from the -X importtime output as dicts with self/cumulative milliseconds
+        and the nesting depth of the import
+        """
+        modules = []
+        for line in output.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            try:
+                own, cumulative, name = line[len('import time:'):].split('|', 2)
+                depth = (len(name) - len(name.lstrip()) - 1) // 2
+                modules.append({
+                    'name': name.strip(),
+                    'self_ms': int(own) / 1000,
+                    'cumulative_ms': int(cumulative) / 1000,
+                    'depth': depth,
+                })
+            except ValueError:
+                continue
+        return modules
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    profiler = MyStartupProfiler()
+    start = time.perf_counter()
+    phases = profiler.run(schema='--sin-schema' not in sys.argv)
+    print(json.dumps({'phases': phases, 'total_ms': (time.perf_counter() - start) * 1000}))
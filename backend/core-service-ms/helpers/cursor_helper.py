@@ -0,0 +1,36 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from django.db.models import Q
+
+
+class HelperCursor:
+    """
+    Opaque keyset cursor over (date field, id), for lists ordered by both descending
+    """
+
+    @staticmethod
+    def codificar(fecha, objeto_id):
+        valor = f"{fecha.isoformat()}|{objeto_id}"
+        return urlsafe_b64encode(valor.encode()).decode()
+
+    @staticmethod
+    def decodificar(cursor):
+        try:
+            fecha, objeto_id = urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return datetime.fromisoformat(fecha), int(objeto_id)
+        except (ValueError, TypeError):
+            raise NameError('Cursor inválido')
+
+    @classmethod
+    def filtro(cls, cursor, campo_fecha):
+        """Condición de las filas posteriores al cursor en orden (campo_fecha, id) descendente"""
+        fecha, objeto_id = cls.decodificar(cursor)
+        return Q(**{f'{campo_fecha}__lt': fecha}) | Q(**{campo_fecha: fecha, 'id__lt': objeto_id})
+
+    @staticmethod
+    def limite(valor, por_defecto, maximo):
+        try:
+            limite = int(valor or por_defecto)
+        except (TypeError, ValueError):
+            limite = por_defecto
+        return max(1, min(limite, maximo))
@@ -0,0 +1,165 @@
+import asyncio
+import json
+import logging
+import threading
+from django.db import transaction
+from core.my_cache import MyRedis
+
+logger = logging.getLogger(__name__)
+
+
+class _EventHub:
+    """
+    Per-process fan-out of published events to local subscriber queues.
+    With Redis, a single pub/sub connection per worker receives events published by any
+    worker; without Redis, publish() dispatches directly to the subscribers of this process.
+    """
+    QUEUE_SIZE = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loop = None
+        self.subscribers = {}
+        self.pubsub = None
+        self.reader = None
+
+    def dispatch(self, channel, payload):
+        for queue in list(self.subscribers.get(channel, ())):
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # Subscriber too slow; it will get the current state on reconnect
+                pass
+
+    def dispatch_threadsafe(self, channel, payload):
+        with self.lock:
+            loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.dispatch, channel, payload)
+
+    async def subscribe(self, channels):
+        with self.lock:
+            self.loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        new_channels = [channel for channel in channels if channel not in self.subscribers]
+        for channel in channels:
+            self.subscribers.setdefault(channel, set()).add(queue)
+        if new_channels and await self._ensure_pubsub():
+            await self.pubsub.subscribe(*new_channels)
+        return queue
+
+    async def unsubscribe(self, channels, queue):
+        empty_channels = []
+        for channel in channels:
+            queues = self.subscribers.get(channel)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[channel]
+                empty_channels.append(channel)
+        if empty_channels and self.pubsub is not None:
+            try:
+                await self.pubsub.unsubscribe(*empty_channels)
+            except Exception as e:
+                logger.warning(f"Error al cancelar suscripción de eventos: {e}")
+
+    async def _ensure_pubsub(self):
+        if self.pubsub is not None:
+            return True
+        client = MyRedis.async_connection()
+        if client is None:
+            return False
+        self.pubsub = client.pubsub()
+        self.reader = asyncio.ensure_future(self._read())
+        return True
+
+    async def _read(self):
+        while True:
+            try:
+                if self.pubsub.connection is None:
+                    await asyncio.sleep(0.5)
+                    continue
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message and message.get('type') == 'message':
+                    channel = message['channel']
+                    data = message['data']
+                    self.dispatch(
+                        channel.decode() if isinstance(channel, bytes) else channel,
+                        data.decode() if isinstance(data, bytes) else data
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error leyendo eventos de Redis: {e}")
+                await asyncio.sleep(1)
+                try:
+                    await self.pubsub.aclose()
+                    if self.subscribers:
+                        await self.pubsub.subscribe(*self.subscribers.keys())
+                except Exception as e:
+                    logger.error(f"Error reconectando a Redis pub/sub: {e}")
+
+
+class HelperEvents:
+    """
+    Publish/subscribe of transport state changes (ride requests, trips, driver position)
+    """
+    SOLICITUD = 'transport:solicitud:{}'
+    VIAJE = 'transport:viaje:{}'
+    CONDUCTOR_UBICACION = 'transport:conductor:{}:ubicacion'
+    _hub = _EventHub()
+
+    @classmethod
+    def channel(cls, template, object_id):
+        return f"{MyRedis.PREFIX}:{MyRedis.SUFFIX}:{template.format(object_id)}"
+
+    @classmethod
+    def publish(cls, channel, event_type, data):
+        """
+        Publish an event to every subscriber of the channel in any worker
+        """
+        payload = json.dumps({'tipo': event_type, 'data': data}, default=str)
+        try:
+            connection = MyRedis.connection()
+            if connection is not None:
+                connection.publish(channel, payload)
+            else:
+                cls._hub.dispatch_threadsafe(channel, payload)
+        except Exception as e:
+            # Los eventos son best-effort: los clientes reciben el estado actual al reconectar
+            logger.error(f"Error publicando evento {event_type} en {channel}: {e}")
+
+    @classmethod
+    def publish_on_commit(cls, channel, event_type, data):
+        """
+        Publish once the current transaction commits (immediately outside a transaction)
+        """
+        transaction.on_commit(lambda: cls.publish(channel, event_type, data))
+
+    @classmethod
+    async def subscribe(cls, channels, initial=None, heartbeat=15, max_duration=300):
+        """
+        Async iterator of decoded events for the given channels. Yields None every
+        `heartbeat` seconds without events, and stops after `max_duration` seconds.
+        `initial` is an optional coroutine function whose result is yielded first, once
+        subscribed, so no transition is lost between a state snapshot and the subscription.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_duration
+        queue = await cls._hub.subscribe(channels)
+        try:
+            if initial is not None:
+                yield await initial()
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout=min(heartbeat, remaining))
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield json.loads(payload)
+        finally:
+            await cls._hub.unsubscribe(channels, queue)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from math import radians, degrees, sin, cos, asin, sqrt, floor
+
+
+class HelperGeo(object):
+    RADIO_TIERRA_KM = 6371.0
+    # Tamaño de celda de la grilla (~5.5 km en el ecuador)
+    CELDA_GRADOS = 0.05
+
+    @staticmethod
+    def haversine(lat1, lon1, lat2, lon2):
+        """Calcula distancia en km entre dos puntos usando Haversine"""
+        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+        return 2 * HelperGeo.RADIO_TIERRA_KM * asin(sqrt(a))
+
+    @staticmethod
+    def bounding_box(lat, lng, radio_km):
+        """
+        Rectángulo (lat_min, lat_max, lng_min, lng_max) que contiene el círculo de radio_km
+        alrededor del punto. Sirve como pre-filtro indexable antes de calcular Haversine.
+        """
+        delta_lat = degrees(radio_km / HelperGeo.RADIO_TIERRA_KM)
+        cos_lat = cos(radians(lat))
+        if cos_lat < 1e-6:
+            # Cerca de los polos cualquier longitud puede estar dentro del radio
+            delta_lng = 180.0
+        else:
+            delta_lng = min(180.0, delta_lat / cos_lat)
+        return (
+            max(-90.0, lat - delta_lat),
+            min(90.0, lat + delta_lat),
+            max(-180.0, lng - delta_lng),
+            min(180.0, lng + delta_lng),
+        )
+
+    @staticmethod
+    def distancias(lat, lng, puntos):
+        """
+        Haversine desde (lat, lng) hacia una lista de puntos (lat, lng) en una sola pasada,
+        calculando una vez los términos que dependen solo del origen.
+        """
+        lat0 = radians(lat)
+        lng0 = radians(lng)
+        cos_lat0 = cos(lat0)
+        diametro = 2 * HelperGeo.RADIO_TIERRA_KM
+        resultado = []
+        for lat1, lng1 in puntos:
+            lat1 = radians(lat1)
+            a = sin((lat1 - lat0) / 2) ** 2 + cos_lat0 * cos(lat1) * sin((radians(lng1) - lng0) / 2) ** 2
+            resultado.append(diametro * asin(sqrt(a)))
+        return resultado
+
+    @staticmethod
+    def celda(lat, lng, tamano=None):
+        """Celda de la grilla que contiene el punto"""
+        tamano = tamano or HelperGeo.CELDA_GRADOS
+        return floor(lat / tamano), floor(lng / tamano)
+
+    @staticmethod
+    def celdas_cercanas(lat, lng, radio_km, tamano=None, maximo=None):
+        """
+        Celdas de la grilla que intersectan el rectángulo del radio alrededor del punto.
+        None si son más de 'maximo' (se calcula antes de generar la lista)
+        """
+        tamano = tamano or HelperGeo.CELDA_GRADOS
+        lat_min, lat_max, lng_min, lng_max = HelperGeo.bounding_box(lat, lng, radio_km)
+        fila_min, columna_min = HelperGeo.celda(lat_min, lng_min, tamano)
+        fila_max, columna_max = HelperGeo.celda(lat_max, lng_max, tamano)
+        if maximo is not None and (fila_max - fila_min + 1) * (columna_max - columna_min + 1) > maximo:
+            return None
+        return [
+            (fila, columna)
+            for fila in range(fila_min, fila_max + 1)
+            for columna in range(columna_min, columna_max + 1)
+        ]
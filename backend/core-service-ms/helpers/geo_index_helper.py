@@ -0,0 +1,105 @@
+import threading
+from core.my_base import MY_GEO_INDEX_MAX_CELDAS
+from core.my_cache import MyRedis, RedisKeys
+from helpers.geo_helper import HelperGeo
+
+
+class _RedisGeoIndexBackend:
+    """One Redis set of ids per grid cell"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def add(self, key, member, ttl):
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.sadd(key, member)
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def remove_many(self, items):
+        pipe = self.connection.pipeline(transaction=False)
+        for key, member in items:
+            pipe.srem(key, member)
+        pipe.execute()
+
+    def union(self, keys):
+        return {int(member) for member in self.connection.sunion(keys)} if keys else set()
+
+
+class _LocalGeoIndexBackend:
+    """Process-local stand-in used when the cache backend is not Redis (development, tests)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cells = {}
+
+    def add(self, key, member, ttl):
+        with self.lock:
+            self.cells.setdefault(key, set()).add(int(member))
+
+    def remove_many(self, items):
+        with self.lock:
+            for key, member in items:
+                self.cells.get(key, set()).discard(int(member))
+
+    def union(self, keys):
+        with self.lock:
+            return set().union(*(self.cells.get(key, set()) for key in keys))
+
+
+class HelperGeoIndex:
+    """
+    Grid-cell index of points by namespace (e.g. pending ride requests by origin).
+    A nearby query only reads the cells that intersect the search radius.
+    """
+    TTL = 60 * 60 * 24  # Safety net for cells whose members were never removed
+    MAX_CELDAS = MY_GEO_INDEX_MAX_CELDAS
+    _local_backend = _LocalGeoIndexBackend()
+
+    @classmethod
+    def backend(cls):
+        connection = MyRedis.connection()
+        if connection is None:
+            return cls._local_backend
+        return _RedisGeoIndexBackend(connection)
+
+    @staticmethod
+    def _key(namespace, lat, lng):
+        fila, columna = HelperGeo.celda(float(lat), float(lng))
+        return RedisKeys.GEO_INDEX_CELDA.format(namespace, fila, columna)
+
+    @classmethod
+    def add(cls, namespace, member_id, lat, lng):
+        """
+        Index a point in the cell containing (lat, lng)
+        """
+        cls.backend().add(cls._key(namespace, lat, lng), member_id, cls.TTL)
+
+    @classmethod
+    def remove(cls, namespace, member_id, lat, lng):
+        """
+        Remove a point previously indexed at (lat, lng)
+        """
+        cls.remove_many(namespace, [(member_id, lat, lng)])
+
+    @classmethod
+    def remove_many(cls, namespace, points):
+        """
+        Remove several (member_id, lat, lng) points in one round trip
+        """
+        items = [(cls._key(namespace, lat, lng), member_id) for member_id, lat, lng in points]
+        if items:
+            cls.backend().remove_many(items)
+
+    @classmethod
+    def nearby(cls, namespace, lat, lng, radio_km):
+        """
+        Ids indexed in the cells that intersect the radius around (lat, lng).
+        Candidates still need an exact distance check. None when the radius covers more
+        than MAX_CELDAS cells: the caller has to search the database instead.
+        """
+        celdas = HelperGeo.celdas_cercanas(float(lat), float(lng), float(radio_km), maximo=cls.MAX_CELDAS)
+        if celdas is None:
+            return None
+        keys = [RedisKeys.GEO_INDEX_CELDA.format(namespace, fila, columna) for fila, columna in celdas]
+        return cls.backend().union(keys)
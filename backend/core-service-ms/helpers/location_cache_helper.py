@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
+from core.my_base import MY_UBICACION_TTL, MY_UBICACION_FLUSH_INTERVAL, MY_UBICACION_FLUSH_BATCH
+from core.my_cache import MyRedis, RedisKeys
+
+logger = logging.getLogger(__name__)
+
+
+class _RedisLocationBackend:
+    """Last fix per driver in a key with TTL plus a set of drivers pending persistence"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def put(self, conductor_id, payload, ttl):
+        pipe = self.connection.pipeline(transaction=False)
+        pipe.set(RedisKeys.TRANSPORT_UBICACION.format(conductor_id), payload, ex=ttl)
+        pipe.sadd(RedisKeys.TRANSPORT_UBICACION_PENDIENTES, conductor_id)
+        pipe.execute()
+
+    def get_many(self, conductor_ids):
+        if not conductor_ids:
+            return {}
+        keys = [RedisKeys.TRANSPORT_UBICACION.format(conductor_id) for conductor_id in conductor_ids]
+        values = self.connection.mget(keys)
+        return {
+            int(conductor_id): value.decode() if isinstance(value, bytes) else value
+            for conductor_id, value in zip(conductor_ids, values) if value
+        }
+
+    def pop_pending(self, count):
+        conductor_ids = self.connection.spop(RedisKeys.TRANSPORT_UBICACION_PENDIENTES, count) or []
+        return [int(conductor_id) for conductor_id in conductor_ids]
+
+    def restore_pending(self, conductor_ids):
+        if conductor_ids:
+            self.connection.sadd(RedisKeys.TRANSPORT_UBICACION_PENDIENTES, *conductor_ids)
+
+    def acquire_flush(self, interval):
+        return bool(self.connection.set(RedisKeys.TRANSPORT_UBICACION_FLUSH_LOCK, 1, nx=True, ex=interval))
+
+
+class _LocalLocationBackend:
+    """Process-local stand-in used when the cache backend is not Redis (development, tests)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fixes = {}
+        self.pending = set()
+        self.next_flush = 0
+
+    def put(self, conductor_id, payload, ttl):
+        with self.lock:
+            self.fixes[conductor_id] = (payload, time.time() + ttl)
+            self.pending.add(conductor_id)
+
+    def get_many(self, conductor_ids):
+        now = time.time()
+        with self.lock:
+            return {
+                conductor_id: self.fixes[conductor_id][0]
+                for conductor_id in conductor_ids
+                if conductor_id in self.fixes and self.fixes[conductor_id][1] > now
+            }
+
+    def pop_pending(self, count):
+        with self.lock:
+            return [self.pending.pop() for _ in range(min(count, len(self.pending)))]
+
+    def restore_pending(self, conductor_ids):
+        with self.lock:
+            self.pending.update(conductor_ids)
+
+    def acquire_flush(self, interval):
+        with self.lock:
+            now = time.time()
+            if now < self.next_flush:
+                return False
+            self.next_flush = now + interval
+            return True
+
+
+class HelperLocationCache:
+    """
+    Hot store for driver GPS pings. Pings are O(1) cache writes; the Conductor table
+    is updated in batches at most once every MY_UBICACION_FLUSH_INTERVAL seconds by a
+    background thread of the worker, never inside the ping request.
+    """
+    TTL = MY_UBICACION_TTL
+    FLUSH_INTERVAL = MY_UBICACION_FLUSH_INTERVAL
+    FLUSH_BATCH = MY_UBICACION_FLUSH_BATCH
+    _local_backend = _LocalLocationBackend()
+    _flusher = None
+    _flusher_lock = threading.Lock()
+
+    @classmethod
+    def backend(cls):
+        connection = MyRedis.connection()
+        if connection is None:
+            return cls._local_backend
+        return _RedisLocationBackend(connection)
+
+    @staticmethod
+    def _encode(lat, lng, timestamp):
+        return f"{lat},{lng},{timestamp}"
+
+    @staticmethod
+    def _decode(payload):
+        lat, lng, timestamp = payload.split(',')
+        return {
+            'lat': float(lat),
+            'lng': float(lng),
+            'timestamp': float(timestamp),
+        }
+
+    @staticmethod
+    def to_datetime(timestamp):
+        if settings.USE_TZ:
+            return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+        return datetime.fromtimestamp(timestamp)
+
+    @classmethod
+    def set_location(cls, conductor_id, lat, lng, timestamp=None):
+        """
+        Store the latest fix of a driver and schedule it for persistence
+        """
+        timestamp = timestamp or time.time()
+        cls.backend().put(int(conductor_id), cls._encode(lat, lng, timestamp), cls.TTL)
+        cls.start_flusher()
+
+    @classmethod
+    def get_location(cls, conductor_id):
+        """
+        Latest fix of a driver, or None if there is no ping within TTL
+        """
+        return cls.get_locations([conductor_id]).get(int(conductor_id))
+
+    @classmethod
+    def get_locations(cls, conductor_ids):
+        """
+        Latest fixes for several drivers in one round trip
+        """
+        payloads = cls.backend().get_many([int(conductor_id) for conductor_id in conductor_ids])
+        return {conductor_id: cls._decode(payload) for conductor_id, payload in payloads.items()}
+
+    @classmethod
+    def start_flusher(cls):
+        """
+        Start, once per process, the daemon thread that calls flush_if_due every FLUSH_INTERVAL
+        """
+        if cls._flusher is None:
+            with cls._flusher_lock:
+                if cls._flusher is None:
+                    cls._flusher = threading.Thread(target=cls._run_flusher, name='ubicaciones-flush', daemon=True)
+                    cls._flusher.start()
+
+    @classmethod
+    def _run_flusher(cls):
+        from django.db import close_old_connections
+
+        while True:
+            time.sleep(cls.FLUSH_INTERVAL)
+            close_old_connections()
+            try:
+                cls.flush_if_due()
+            except Exception as e:
+                # Los ids vuelven a pendientes; el siguiente ciclo reintenta la persistencia
+                logger.error(f"Error al persistir ubicaciones: {e}")
+
+    @classmethod
+    def flush_if_due(cls):
+        """
+        Persist pending fixes if no worker has done so within FLUSH_INTERVAL
+        """
+        if cls.backend().acquire_flush(cls.FLUSH_INTERVAL):
+            return cls.flush()
+        return 0
+
+    @classmethod
+    def flush(cls, batch_size=None):
+        """
+        Write pending fixes to the Conductor table with one bulk UPDATE per batch
+        """
+        from security.models import Conductor
+
+        batch_size = batch_size or cls.FLUSH_BATCH
+        backend = cls.backend()
+        total = 0
+        while True:
+            conductor_ids = backend.pop_pending(batch_size)
+            if not conductor_ids:
+                break
+            conductores = []
+            # Las posiciones vencidas (sin ping dentro del TTL) ya no se persisten
+            for conductor_id, payload in backend.get_many(conductor_ids).items():
+                fix = cls._decode(payload)
+                conductores.append(Conductor(
+                    id=conductor_id,
+                    ubicacion_actual_lat=Decimal(str(round(fix['lat'], 6))),
+                    ubicacion_actual_lng=Decimal(str(round(fix['lng'], 6))),
+                    ultima_actualizacion_ubicacion=cls.to_datetime(fix['timestamp']),
+                ))
+            if not conductores:
+                continue
+            try:
+                Conductor.objects.bulk_update(
+                    conductores,
+                    ['ubicacion_actual_lat', 'ubicacion_actual_lng', 'ultima_actualizacion_ubicacion'],
+                    batch_size=batch_size
+                )
+            except Exception:
+                # SPOP ya los quitó: vuelven a pendientes para que el siguiente flush los persista
+                backend.restore_pending(conductor_ids)
+                raise
+            total += len(conductores)
+        return total
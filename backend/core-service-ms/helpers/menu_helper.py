@@ -0,0 +1,139 @@
+from collections import defaultdict
+from datetime import date
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from core.my_cache import MY_Cache, RedisKeys
+from helpers.permission_helper import HelperPermission
+
+
+class HelperMenu:
+    """
+    Menu structure compiled per (menu, profile) in a constant number of queries and cached.
+    The cache key carries three version counters (global, menu, profile) that are bumped
+    when the rows the structure depends on change, so stale trees are never read again.
+    """
+    GLOBAL = 'global'
+    LIFETIME = 60 * 60 * 24
+
+    @classmethod
+    def _version_key(cls, scope):
+        return RedisKeys.MENU_VERSION.format(scope)
+
+    @classmethod
+    def bump_version(cls, scope):
+        """
+        Invalidate every structure compiled under a scope ('global', 'menu:<id>', 'profile:<id>')
+        """
+        key = cls._version_key(scope)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # La clave expiró o fue desalojada entre add e incr
+            cache.set(key, 1, None)
+
+    @classmethod
+    def bump_version_on_commit(cls, scope, using=None):
+        transaction.on_commit(lambda: cls.bump_version(scope), using=using)
+
+    @classmethod
+    def version_token(cls, menu_id, profile=None):
+        """
+        Current versions of the scopes a structure or evaluator for (menu, profile) depends on
+        """
+        scopes = [cls.GLOBAL, f"menu:{menu_id}"]
+        if profile is not None:
+            scopes.append(f"profile:{profile.pk}")
+        keys = [cls._version_key(scope) for scope in scopes]
+        versions = cache.get_many(keys)
+        token = '.'.join(str(versions.get(key, 0)) for key in keys)
+        if profile is not None:
+            # Las negaciones tienen vigencia por fecha y el superusuario no pasa por los permisos
+            token = f"{token}.{int(profile.user.is_superuser)}.{date.today().isoformat()}"
+        return token
+
+    @classmethod
+    def _cache(cls, menu, profile):
+        return MY_Cache(
+            key=RedisKeys.MENU_ESTRUCTURA.format(
+                menu.pk, profile.pk if profile is not None else 0, cls.version_token(menu.pk, profile)
+            ),
+            lifetime=cls.LIFETIME
+        )
+
+    @classmethod
+    def get_structure(cls, menu, profile=None):
+        """
+        Cached menu structure for the profile (see compile)
+        """
+        eCache = cls._cache(menu, profile)
+        structure = eCache.get()
+        if structure is None:
+            structure = cls.compile(menu, profile)
+            eCache.set(structure)
+        return structure
+
+    @classmethod
+    def compile(cls, menu, profile=None):
+        """
+        Build the menu structure for the role/branch of the menu, applying the same rules
+        as MenuItem.can_access and the ProfileAllowed extras, without per-item queries.
+        Access is answered by a PermissionEvaluator loaded once for the profile.
+        """
+        from security.models import MenuItem, ProfileAllowed
+
+        items = list(
+            MenuItem.objects.filter(menu_id=menu.pk, is_current=True)
+            .select_related('module')
+            .order_by('order', 'id')
+        )
+        evaluator = HelperPermission.load(profile, menu.pk) if profile is not None else None
+
+        children = defaultdict(list)
+        for item in items:
+            if not (item.is_active and item.is_visible):
+                continue
+            if evaluator is not None and not evaluator.can_access(item):
+                continue
+            children[item.parent_id].append(item)
+
+        def build(item):
+            return {
+                'id': item.id,
+                'name': item.name,
+                'type': item.type,
+                'path': item.path if not item.module_id else reverse(item.module.path),
+                'target': item.target,
+                'is_external': item.is_external,
+                'children': [build(child) for child in children.get(item.id, [])]
+            }
+
+        structure = [build(item) for item in children.get(None, [])]
+
+        if profile is not None:
+            in_menu = {item.module_id for item in items if item.module_id}
+            extras = (
+                ProfileAllowed.objects
+                .filter(profile_id=profile.pk, is_current=True)
+                .select_related('module')
+                .order_by('module__name')
+            )
+            for pa in extras:
+                module = pa.module
+                if not (module.is_current and module.is_active):
+                    continue
+                if module.pk in in_menu or evaluator.is_denied(module.pk):
+                    continue
+                in_menu.add(module.pk)
+                structure.append({
+                    'id': module.pk,
+                    'name': module.name,
+                    'type': 'MODULE',
+                    'path': reverse(module.path),
+                    'target': '_self',
+                    'is_external': False,
+                    'children': []
+                })
+
+        return structure
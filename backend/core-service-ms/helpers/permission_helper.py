@@ -0,0 +1,162 @@
+from datetime import date
+from django.db.models import Q
+from core.my_cache import MY_Cache, RedisKeys
+
+
+class PermissionEvaluator:
+    """
+    Permission grants of a profile loaded into sets of (module_id, code) and (item_id, code).
+    Answers without database access; it is picklable so it can be cached as a whole.
+    """
+
+    def __init__(self, is_superuser, modules, required, denied, allowed, role_grants, item_grants):
+        self.is_superuser = is_superuser
+        self.modules = modules
+        self.required = required
+        self.denied = denied
+        self.allowed = allowed
+        self.role_grants = role_grants
+        self.item_grants = item_grants
+
+    def module_id(self, code):
+        """Id of the current and active module with that code, or None"""
+        return self.modules.get(code)
+
+    def is_denied(self, module_id, code=None):
+        return (module_id, code or HelperPermission.ACCESS) in self.denied
+
+    def has_permission(self, module_id, code=None, item_id=None):
+        """
+        Same order as MenuItem.can_access: superuser, explicit denial, module requirement,
+        ProfileAllowed and finally the role grant (the menu item or any item of the role menu)
+        """
+        code = code or HelperPermission.ACCESS
+        if self.is_superuser:
+            return True
+        key = (module_id, code)
+        if key in self.denied:
+            return False
+        if key not in self.required:
+            return True
+        if key in self.allowed:
+            return True
+        if item_id is not None:
+            return (item_id, code) in self.item_grants
+        return key in self.role_grants
+
+    def has_module_permission(self, module_code, code=None):
+        module_id = self.module_id(module_code)
+        if module_id is None:
+            return self.is_superuser
+        return self.has_permission(module_id, code)
+
+    def can_access(self, item):
+        if self.is_superuser:
+            return True
+        if not (item.is_active and item.is_current and item.is_visible):
+            return False
+        if not item.module_id:
+            return True
+        return self.has_permission(item.module_id, HelperPermission.ACCESS, item.id)
+
+
+class HelperPermission:
+    """
+    Builds PermissionEvaluator instances in a fixed number of queries, cached under the
+    same version counters HelperMenu uses for the compiled menus
+    """
+    ACCESS = 'can_access'
+    LIFETIME = 60 * 60 * 24
+
+    @staticmethod
+    def menu_id(profile):
+        """Id of the menu of the role and branch of the profile, or None"""
+        from security.models import Menu
+
+        return Menu.objects.filter(
+            role_id=profile.role_id, branch_id=profile.branch_id
+        ).values_list('id', flat=True).first()
+
+    @classmethod
+    def load(cls, profile, menu_id):
+        """
+        Evaluator for the profile; role grants come from the items of the menu (None for no menu)
+        """
+        from security.models import MenuItem, Module, ProfileAllowed, ProfileDenied
+
+        today = date.today()
+        in_force = Q(start_date__lte=today) & Q(Q(end_date__isnull=True) | Q(end_date__gte=today))
+
+        modules = dict(
+            Module.objects.filter(is_current=True, is_active=True).values_list('code', 'id')
+        )
+        required = set(
+            Module.permissions.through.objects.values_list('module_id', 'permission__code')
+        )
+        denied = set(
+            ProfileDenied.objects.filter(in_force, profile_id=profile.pk, is_current=True)
+            .values_list('module_id', 'permissions__code')
+        )
+        allowed = set(
+            ProfileAllowed.objects.filter(in_force, profile_id=profile.pk, is_current=True)
+            .values_list('module_id', 'permissions__code')
+        )
+        role_grants = set()
+        item_grants = set()
+        if menu_id is not None:
+            for item_id, module_id, code in MenuItem.permissions.through.objects.filter(
+                menuitem__menu_id=menu_id
+            ).values_list('menuitem_id', 'menuitem__module_id', 'permission__code'):
+                item_grants.add((item_id, code))
+                if module_id is not None:
+                    role_grants.add((module_id, code))
+
+        return PermissionEvaluator(
+            is_superuser=profile.user.is_superuser,
+            modules=modules,
+            required=required,
+            denied=denied,
+            allowed=allowed,
+            role_grants=role_grants,
+            item_grants=item_grants
+        )
+
+    @classmethod
+    def evaluator(cls, profile, menu_id=None):
+        """
+        Cached evaluator for the profile (see load)
+        """
+        from helpers.menu_helper import HelperMenu
+
+        if menu_id is None:
+            menu_id = cls.menu_id(profile)
+        eCache = MY_Cache(
+            key=RedisKeys.PERMISOS_PERFIL.format(profile.pk, HelperMenu.version_token(menu_id, profile)),
+            lifetime=cls.LIFETIME
+        )
+        evaluator = eCache.get()
+        if evaluator is None:
+            evaluator = cls.load(profile, menu_id)
+            eCache.set(evaluator)
+        return evaluator
+
+    @classmethod
+    def for_request(cls, request):
+        """
+        Evaluator of the profile of the authenticated user in the role and branch of the session,
+        memoized on the request. None when the user has no such profile.
+        """
+        if not hasattr(request, '_permission_evaluator'):
+            from security.models import Profile
+
+            evaluator = None
+            role = getattr(request, 'role', None)
+            branch = getattr(request, 'branch', None)
+            if request.user and request.user.is_authenticated and role and branch:
+                profile = Profile.objects.filter(
+                    user=request.user, role_id=role.pk, branch_id=branch.pk
+                ).select_related('user').first()
+                if profile is not None:
+                    evaluator = cls.evaluator(profile)
+            request._permission_evaluator = evaluator
+        return request._permission_evaluator
@@ -1,9 +1,21 @@
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
+from core.my_renderers import dumps
 from core.my_response import MyResponse
 from rest_framework import status
 
 
 class HelperResponse(MyResponse):
+    STREAM_JSON = 'json'
+    STREAM_NDJSON = 'ndjson'
+    STREAM_CONTENT_TYPES = {
+        STREAM_JSON: 'application/json',
+        STREAM_NDJSON: 'application/x-ndjson',
+    }
+    # Filas codificadas por cada fragmento enviado al cliente
+    STREAM_BATCH = 200
 
     def __init__(self):
         super(HelperResponse, self).__init__()
@@ -15,6 +27,9 @@ class HelperResponse(MyResponse):
         self.errors = {}
         self.datatable = {}
         self.code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        self.stream = None
+        self.stream_format = self.STREAM_JSON
+        self.filename = None
 
     def set_form(self, name_key, arr_form):
         self.forms[name_key] = arr_form
@@ -40,14 +55,91 @@ class HelperResponse(MyResponse):
     def set_status(self, code):
         self.code = code
 
-    def set_datatable(self, arr_data, recordsTotal, recordsFiltered):
+    def set_datatable(self, arr_data, recordsTotal, recordsFiltered, cursor=None):
         self.datatable = {
             'aaData': arr_data,
             'iTotalRecords': recordsTotal,
             'iTotalDisplayRecords': recordsFiltered
         }
+        if cursor:
+            self.datatable['siguiente'] = cursor
+
+    def set_stream(self, rows, stream_format=None, filename=None):
+        """
+        Streaming mode: rows is an iterable of dicts (typically a generator over
+        queryset.iterator(chunk_size=...)) encoded while it is sent, so memory does not
+        grow with the row count. 'json' emits the usual envelope with aData as an array,
+        'ndjson' one object per line.
+
+        The body is an async iterator, as the service runs under ASGI: with a sync one
+        Django would collect the whole export in a list before sending the first byte.
+        Rows are read and encoded in batches in the request's sync thread (sync_to_async),
+        where the database connection of the iterator lives.
+        """
+        if stream_format and stream_format not in self.STREAM_CONTENT_TYPES:
+            raise NameError(f"Formato de exportación no soportado: {stream_format}")
+        self.stream = rows
+        self.stream_format = stream_format or self.STREAM_JSON
+        self.filename = filename
+
+    @classmethod
+    def get_stream_format(cls, request):
+        """Format requested with ?formato=json|ndjson"""
+        return request.query_params.get('formato') or cls.STREAM_JSON
+
+    def _next_batch(self, rows):
+        return [dumps(row) for row in islice(rows, self.STREAM_BATCH)]
+
+    @staticmethod
+    def _close(rows):
+        close = getattr(rows, 'close', None)
+        if close is not None:
+            close()
+
+    async def _batches(self):
+        rows = iter(self.stream)
+        next_batch = sync_to_async(self._next_batch)
+        try:
+            while True:
+                batch = await next_batch(rows)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            # Cliente desconectado o fin del export: libera el cursor del iterator()
+            await sync_to_async(self._close)(rows)
+
+    async def _stream_json(self):
+        head = dumps({'is_success': self.is_success, 'message': self.message})
+        yield head[:-1] + b',"aData":['
+        first = True
+        async for batch in self._batches():
+            yield (b'' if first else b',') + b','.join(batch)
+            first = False
+        yield b']}'
+
+    async def _stream_ndjson(self):
+        async for batch in self._batches():
+            yield b'\n'.join(batch) + b'\n'
+
+    def to_stream(self):
+        content = self._stream_ndjson() if self.stream_format == self.STREAM_NDJSON else self._stream_json()
+        response = StreamingHttpResponse(
+            content, status=self.code, content_type=self.STREAM_CONTENT_TYPES[self.stream_format]
+        )
+        if self.filename:
+            extension = 'ndjson' if self.stream_format == self.STREAM_NDJSON else 'json'
+            response['Content-Disposition'] = f'attachment; filename="{self.filename}.{extension}"'
+        # Sin buffer en el proxy: cada fragmento sale apenas se codifica
+        response['X-Accel-Buffering'] = 'no'
+        for key, value in (self.headers or {}).items():
+            response[key] = value
+        return response
 
     def to_dict(self, show_empty=False, **kwargs):
+        if self.stream is not None:
+            return self.to_stream()
+
         response_dict = super(HelperResponse, self).to_dict(show_empty, **kwargs)
 
         if self.forms or show_empty:
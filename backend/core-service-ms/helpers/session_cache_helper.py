@@ -2,39 +2,61 @@ from django.conf import settings
 from django.core.cache import cache
 from datetime import timedelta
 import json
+import time
 import uuid
+from core.my_cache import MyLocalCache
 
 
 class HelperSessionCache:
     PREFIX = 'session:'
     TOKEN_PREFIX = 'token:'
+    # Tokens revocados antes de expirar; business-service-ms los lee del mismo Redis
+    REVOKED_PREFIX = 'revoked:'
     DEFAULT_TIMEOUT = 60 * 60 * 24  # 24 hours in seconds
+    # Only rewrite the TTL once less than this fraction of it is left
+    EXTEND_THRESHOLD = 0.5
 
     @classmethod
     def generate_session_id(cls):
         return str(uuid.uuid4())
 
+    @classmethod
+    def _session_key(cls, session_id):
+        return f"{cls.PREFIX}{session_id}"
+
+    @classmethod
+    def _store(cls, session_key, session_data, timeout):
+        cache.set(session_key, session_data, timeout)
+        # Other workers drop their local copy; this one keeps the fresh data
+        MyLocalCache.invalidate(session_key)
+        MyLocalCache.set(session_key, session_data, timeout)
+
     @classmethod
     def create_session(cls, user_data, token_data, timeout=None):
         """
-        Create a new session in Redis cache
+        Create a new session in Redis cache, keyed by the token JTI so it resolves in one read
         """
         from security.models import CompanyBranch, Role
 
-        session_id = cls.generate_session_id()
-        session_key = f"{cls.PREFIX}{session_id}"
-        token_key = f"{cls.TOKEN_PREFIX}{token_data.get('jti', session_id)}"
+        session_id = token_data.get('jti') or cls.generate_session_id()
+        session_key = cls._session_key(session_id)
 
         timeout = timeout or cls.DEFAULT_TIMEOUT
         branch_id = token_data.get('branch_id')
         role_id = token_data.get('role_id')
         branch = None
         if branch_id:
-            branch = CompanyBranch.objects.filter(id=branch_id).first()
+            try:
+                branch = CompanyBranch.objects.cached_get(id=branch_id)
+            except CompanyBranch.DoesNotExist:
+                pass
 
         role = None
         if role_id:
-            role = Role.objects.filter(id=role_id).first()
+            try:
+                role = Role.objects.cached_get(id=role_id)
+            except Role.DoesNotExist:
+                pass
 
         session_data = {
             'user': {
@@ -47,14 +69,14 @@ class HelperSessionCache:
             'branch': branch.to_dict() if branch else None,
             'role': role.to_dict() if role else None,
             'permissions': token_data.get('permissions', []),
-            'token': token_data
+            'token': token_data,
+            'timeout': timeout,
+            'extended_at': time.time(),
         }
 
         # Store session data
         # cache.set(session_key, json.dumps(session_data), timeout)
-        cache.set(session_key, session_data, timeout)
-        # Store token to session mapping
-        cache.set(token_key, session_id, timeout)
+        cls._store(session_key, session_data, timeout)
 
         return session_id
 
@@ -63,19 +85,13 @@ class HelperSessionCache:
         """
         Get session data by token JTI
         """
-        token_key = f"{cls.TOKEN_PREFIX}{token_jti}"
-        session_id = cache.get(token_key)
-
-        if not session_id:
-            return None
-
-        session_key = f"{cls.PREFIX}{session_id}"
-        session_data = cache.get(session_key)
-
-        if not session_data:
-            return None
-
-        return session_data
+        session_key = cls._session_key(token_jti)
+        session_data = MyLocalCache.get(session_key)
+        if session_data is None:
+            session_data = cache.get(session_key)
+            if session_data:
+                MyLocalCache.set(session_key, session_data, session_data.get('timeout'))
+        return session_data or None
 
     @classmethod
     def update_session_from_token(cls, token_jti, user_data, token_data, timeout=None):
@@ -95,36 +111,60 @@ class HelperSessionCache:
         """
         Delete session data
         """
+        # The token key holds the session id of sessions created before they were keyed by JTI
         token_key = f"{cls.TOKEN_PREFIX}{token_jti}"
         session_id = cache.get(token_key)
-
+        keys = [cls._session_key(token_jti), token_key]
         if session_id:
-            session_key = f"{cls.PREFIX}{session_id}"
-            cache.delete(session_key)
-            cache.delete(token_key)
-            return True
-
-        return False
+            keys.append(cls._session_key(session_id))
+        # Redis primero: invalidar antes permitiría a otro worker recargar la sesión vieja en su L1
+        deleted = cache.delete_many(keys)
+        MyLocalCache.invalidate(*keys)
+        return bool(deleted)
 
     @classmethod
-    def extend_session(cls, token_jti, timeout=None):
+    def revoke(cls, token_jti, expires_at):
         """
-        Extend session timeout
+        Revoke a token that is still valid: drop its session and list its JTI as revoked
+        until the token expires (expires_at is the exp claim)
         """
-        token_key = f"{cls.TOKEN_PREFIX}{token_jti}"
-        session_id = cache.get(token_key)
+        if not token_jti:
+            return
+        cls.delete_session(token_jti)
+        remaining = int(expires_at - time.time()) if expires_at else cls.DEFAULT_TIMEOUT
+        if remaining > 0:
+            cache.set(f"{cls.REVOKED_PREFIX}{token_jti}", 1, remaining)
+            # La sesión queda como marca de revocación: la autenticación la ve en su única lectura
+            cls._store(cls._session_key(token_jti), {'revoked': True}, remaining)
 
-        if not session_id:
-            return False
+    @classmethod
+    def is_revoked(cls, token_jti):
+        return bool(token_jti) and cache.get(f"{cls.REVOKED_PREFIX}{token_jti}") is not None
 
-        session_key = f"{cls.PREFIX}{session_id}"
-        session_data = cache.get(session_key)
+    @classmethod
+    def extend_session(cls, token_jti, timeout=None, session_data=None):
+        """
+        Extend session timeout
+        """
+        session_data = session_data or cls.get_session(token_jti)
 
         if not session_data:
             return False
 
-        timeout = timeout or cls.DEFAULT_TIMEOUT
-        cache.set(session_key, session_data, timeout)
-        cache.set(token_key, session_id, timeout)
+        timeout = timeout or session_data.get('timeout') or cls.DEFAULT_TIMEOUT
+        session_data['timeout'] = timeout
+        session_data['extended_at'] = time.time()
+        cls._store(cls._session_key(token_jti), session_data, timeout)
 
         return True
+
+    @classmethod
+    def extend_session_if_due(cls, token_jti, session_data):
+        """
+        Extend the session only when less than EXTEND_THRESHOLD of its timeout is left,
+        instead of rewriting it on every request
+        """
+        timeout = session_data.get('timeout') or cls.DEFAULT_TIMEOUT
+        if time.time() - session_data.get('extended_at', 0) < timeout * (1 - cls.EXTEND_THRESHOLD):
+            return False
+        return cls.extend_session(token_jti, timeout, session_data)
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils.module_loading import import_string
+from helpers.menu_helper import HelperMenu
+from security.context_processors import thread_context
+from security.models import FixtureLoad
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'fixtures')
+
+FIXTURES = [
+    # 'initial_auth_method.json',
+    'initial_company.json',
+    'initial_company_branch.json',
+    'initial_role.json',
+    'initial_permission.json',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga los datos iniciales de security/fixtures. Un archivo cuyo SHA-256 coincide '
+        'con el de su última carga se omite; si cambió, se inserta o actualiza por modelo en bloque'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='*', help=f"Archivos a cargar (por defecto: {', '.join(FIXTURES)})")
+        parser.add_argument('--force', action='store_true', help='Cargar aunque el contenido no haya cambiado')
+
+    def handle(self, *args, **options):
+        names = options['fixtures'] or FIXTURES
+        checksums = dict(FixtureLoad.objects.filter(name__in=names).values_list('name', 'checksum'))
+        loaded = False
+
+        for name in names:
+            path = os.path.join(FIXTURES_DIR, name)
+            if not os.path.exists(path):
+                self.stderr.write(f"Fixture no encontrado: {path}")
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            checksum = hashlib.sha256(content).hexdigest()
+            if not options['force'] and checksums.get(name) == checksum:
+                self.stdout.write(f"{name}: sin cambios")
+                continue
+
+            thread_context.loading_initial_data = True
+            try:
+                with transaction.atomic():
+                    rows = self._load(json.loads(content))
+                    FixtureLoad.objects.update_or_create(name=name, defaults={'checksum': checksum, 'rows': rows})
+            except Exception as e:
+                # Un fixture con errores no impide cargar los demás
+                self.stderr.write(f"Error al cargar {name}: {e}")
+                continue
+            finally:
+                thread_context.loading_initial_data = False
+            loaded = True
+            self.stdout.write(f"{name}: {rows} registros")
+
+        if loaded:
+            # Permisos, roles y sedes alimentan los menús compilados
+            HelperMenu.bump_version(HelperMenu.GLOBAL)
+
+    def _load(self, data):
+        by_model = {}
+        for item in data:
+            by_model.setdefault(item['model'], []).append(item)
+
+        rows = 0
+        for model_path, items in by_model.items():
+            try:
+                model = import_string(model_path)
+            except ImportError as e:
+                self.stderr.write(f"Modelo no encontrado: {model_path} → {e}")
+                continue
+            rows += self._upsert(model, items)
+        return rows
+
+    @staticmethod
+    def _upsert(model, items):
+        """
+        Insert or update the rows of one model with a single INSERT ... ON CONFLICT (pk)
+        """
+        fields = {}
+        for field in model._meta.concrete_fields:
+            fields[field.name] = field
+            fields[field.attname] = field
+
+        rows = []
+        for item in items:
+            values = {fields[key]: value for key, value in item['fields'].items() if key in fields}
+            rows.append((item['pk'], values))
+
+        # ForeignKey hacia registros inexistentes: None si el campo lo permite, si no se omite.
+        # Una consulta por campo en lugar de una por fila.
+        for field in {field for _, values in rows for field in values if field.is_relation}:
+            referenced = {values[field] for _, values in rows if values.get(field) is not None}
+            existing = set(
+                field.related_model._base_manager.filter(pk__in=referenced).values_list('pk', flat=True)
+            )
+            for _, values in rows:
+                if values.get(field) is not None and values[field] not in existing:
+                    if field.null:
+                        values[field] = None
+                    else:
+                        del values[field]
+
+        instances = [
+            model(pk=pk, **{field.attname: value for field, value in values.items()})
+            for pk, values in rows
+        ]
+        update_fields = sorted({
+            field.name for _, values in rows for field in values if not field.primary_key
+        })
+        model._base_manager.bulk_create(
+            instances,
+            update_conflicts=bool(update_fields),
+            ignore_conflicts=not update_fields,
+            unique_fields=[model._meta.pk.name] if update_fields else None,
+            update_fields=update_fields or None
+        )
+
+        # Las pk vienen del fixture: la secuencia debe quedar por encima
+        using = router.db_for_write(model)
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                cursor.execute(sql)
+
+        # bulk_create no emite post_save: se invalidan aquí las filas en caché
+        pks = [pk for pk, _ in rows]
+        transaction.on_commit(lambda: [model.cache(pk).delete() for pk in pks], using=using)
+        return len(rows)
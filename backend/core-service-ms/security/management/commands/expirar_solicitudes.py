@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from api.v1_0_0.transport.solicitud.service import SolicitudViajeService
+
+
+class Command(BaseCommand):
+    help = 'Marca como expiradas las solicitudes de viaje pendientes cuya fecha de expiración ya pasó'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SolicitudViajeService.EXPIRACION_BATCH)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Segundos entre ejecuciones; 0 ejecuta una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total = SolicitudViajeService.expirar_solicitudes(batch_size=options['batch_size'])
+            self.stdout.write(f"Solicitudes expiradas: {total}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
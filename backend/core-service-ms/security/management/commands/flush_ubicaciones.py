@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from helpers.location_cache_helper import HelperLocationCache
+
+
+class Command(BaseCommand):
+    help = 'Persiste en la tabla Conductor las ubicaciones en vivo pendientes del almacén en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=HelperLocationCache.FLUSH_BATCH)
+        parser.add_argument(
+            '--interval', type=int, default=0,
+            help='Segundos entre ejecuciones; 0 ejecuta una sola vez'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            total = HelperLocationCache.flush(batch_size=options['batch_size'])
+            self.stdout.write(f"Ubicaciones persistidas: {total}")
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
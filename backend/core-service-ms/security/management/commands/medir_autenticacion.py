@@ -0,0 +1,54 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import RefreshToken
+from core.my_authentication import CustomJWTAuthentication
+from security.models import User
+
+
+class Command(BaseCommand):
+    help = 'Mide el costo por request de CustomJWTAuthentication (tiempo y consultas a BD)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, help='Id del usuario; por defecto el primero activo')
+        parser.add_argument('--iteraciones', type=int, default=1000)
+        parser.add_argument('--branch', type=int, help='Claim branch_id del token')
+        parser.add_argument('--role', type=int, help='Claim role_id del token')
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.filter(is_active=True).order_by('id')
+        usuario = usuarios.filter(id=options['usuario']).first() if options['usuario'] else usuarios.first()
+        if usuario is None:
+            raise CommandError('No hay usuario para generar el token')
+
+        token = RefreshToken.for_user(usuario).access_token
+        if options['branch']:
+            token['branch_id'] = options['branch']
+        if options['role']:
+            token['role_id'] = options['role']
+        factory = RequestFactory(HTTP_AUTHORIZATION=f'Bearer {token}')
+        autenticacion = CustomJWTAuthentication()
+
+        def autenticar():
+            autenticacion.authenticate(Request(factory.get('/')))
+
+        # Primer request del token: crea la sesión en cache
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            autenticar()
+            primera = time.perf_counter() - inicio
+        self.stdout.write(f"Primer request: {primera * 1000:.3f} ms, {len(consultas)} consultas")
+
+        iteraciones = max(1, options['iteraciones'])
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            for _ in range(iteraciones):
+                autenticar()
+            total = time.perf_counter() - inicio
+        self.stdout.write(
+            f"Sesión en cache: {total / iteraciones * 1000:.3f} ms/request, "
+            f"{len(consultas) / iteraciones:.2f} consultas/request ({iteraciones} iteraciones)"
+        )
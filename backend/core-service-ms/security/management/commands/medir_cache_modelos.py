@@ -0,0 +1,57 @@
+import pickle
+import time
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from core.my_cache import MyModelCodec
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el costo de codificar/decodificar filas para el cache y el tamaño almacenado: '
+        'serializador JSON de Django frente a MyModelCodec'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelo', default='security.Company', help='app_label.Modelo')
+        parser.add_argument('--iteraciones', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['modelo'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        instance = model.objects.first()
+        if instance is None:
+            raise CommandError(f"No hay registros de {options['modelo']}")
+        iteraciones = max(1, options['iteraciones'])
+
+        def json_encode():
+            return serializers.serialize('json', [instance])
+
+        def json_decode(data):
+            for deserialized in serializers.deserialize('json', data):
+                return deserialized.object
+
+        caminos = (
+            ('json', json_encode, json_decode),
+            ('codec', lambda: MyModelCodec.encode(instance), MyModelCodec.decode),
+        )
+        self.stdout.write(f"{options['modelo']} #{instance.pk}, {iteraciones} iteraciones")
+        for nombre, encode, decode in caminos:
+            payload = encode()
+            assert decode(payload).pk == instance.pk
+            inicio = time.perf_counter()
+            for _ in range(iteraciones):
+                encode()
+            codificar = (time.perf_counter() - inicio) / iteraciones
+            inicio = time.perf_counter()
+            for _ in range(iteraciones):
+                decode(payload)
+            decodificar = (time.perf_counter() - inicio) / iteraciones
+            # El backend de Redis guarda los valores con pickle
+            tamano = len(pickle.dumps(payload, pickle.HIGHEST_PROTOCOL))
+            self.stdout.write(
+                f"{nombre:>6}: codificar {codificar * 1e6:8.1f} µs, decodificar {decodificar * 1e6:8.1f} µs, "
+                f"{tamano} bytes"
+            )
@@ -0,0 +1,107 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+from security.models import User
+
+# Exportaciones por partes: (nombre, ruta)
+EXPORTACIONES = {
+    'viajes': '/api/security/v1.0.0/transport/viajes/exportar/',
+    'calificaciones_recibidas': '/api/security/v1.0.0/transport/calificaciones/exportar_recibidas/',
+    'mis_calificaciones': '/api/security/v1.0.0/transport/calificaciones/exportar_mis_calificaciones/',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide la memoria de un worker ASGI (uvicorn, como en producción) mientras envía una '
+        'exportación por partes: RSS inicial y pico, bytes recibidos y tiempo al primer byte'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('exportacion', choices=sorted(EXPORTACIONES))
+        parser.add_argument('--usuario', type=int, help='Id del usuario; por defecto el primero activo')
+        parser.add_argument('--formato', choices=['json', 'ndjson'], default='json')
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.filter(is_active=True).order_by('id')
+        usuario = usuarios.filter(id=options['usuario']).first() if options['usuario'] else usuarios.first()
+        if usuario is None:
+            raise CommandError('No hay usuario para generar el token')
+        token = RefreshToken.for_user(usuario).access_token
+
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'server.settings'))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'server.asgi:application', '--port', str(port), '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env
+        )
+        try:
+            url = f"http://127.0.0.1:{port}{EXPORTACIONES[options['exportacion']]}"
+            headers = {'Authorization': f'Bearer {token}'}
+            self._esperar(f"http://127.0.0.1:{port}/api/", server)
+            # Un request previo carga las apps y la sesión: el RSS inicial ya no incluye el arranque
+            requests.get(url, headers=headers, params={'formato': options['formato']}).content
+
+            inicial = self._rss(server.pid)
+            pico = [inicial]
+            midiendo = threading.Event()
+            midiendo.set()
+
+            def muestrear():
+                while midiendo.is_set():
+                    pico[0] = max(pico[0], self._rss(server.pid))
+                    time.sleep(0.01)
+
+            muestreo = threading.Thread(target=muestrear, daemon=True)
+            muestreo.start()
+            inicio = time.perf_counter()
+            primer_byte = None
+            total = 0
+            with requests.get(url, headers=headers, params={'formato': options['formato']}, stream=True) as response:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if primer_byte is None:
+                        primer_byte = time.perf_counter() - inicio
+                    total += len(chunk)
+            duracion = time.perf_counter() - inicio
+            midiendo.clear()
+            muestreo.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+        self.stdout.write(f"Estado {response.status_code}; {total / 1e6:.1f} MB en {duracion:.2f} s")
+        self.stdout.write(f"Primer byte: {(primer_byte or 0) * 1000:.1f} ms")
+        self.stdout.write(
+            f"RSS del worker: inicial {inicial / 1024:.1f} MB, pico {pico[0] / 1024:.1f} MB "
+            f"(+{(pico[0] - inicial) / 1024:.1f} MB)"
+        )
+
+    @staticmethod
+    def _esperar(url, server):
+        for _ in range(200):
+            if server.poll() is not None:
+                raise CommandError('uvicorn terminó al iniciar')
+            try:
+                requests.head(url, timeout=1)
+                return
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        raise CommandError('uvicorn no respondió')
+
+    @staticmethod
+    def _rss(pid):
+        """Resident memory of the process in KB (Linux /proc)"""
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+        return 0
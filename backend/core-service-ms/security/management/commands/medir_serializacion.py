@@ -0,0 +1,82 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.my_renderers import MyJSONRenderer, orjson
+from security.models import User
+from api.v1_0_0.transport.calificacion.views import CalificacionView
+from api.v1_0_0.transport.conductor.views import ConductorView
+from api.v1_0_0.transport.moto.views import MotoView
+from api.v1_0_0.transport.solicitud.views import SolicitudViajeView
+from api.v1_0_0.transport.viaje.views import ViajeView
+
+# Endpoints GET de transporte: (nombre, vista, acción, parámetros)
+ENDPOINTS = [
+    ('viajes/mis_viajes', ViajeView, 'mis_viajes', {'limit': 100}),
+    ('calificaciones/mis_calificaciones', CalificacionView, 'mis_calificaciones', {'limit': 100}),
+    ('calificaciones/recibidas', CalificacionView, 'recibidas', {'limit': 100}),
+    ('conductores/perfil', ConductorView, 'perfil', {}),
+    ('conductores/disponibles', ConductorView, 'disponibles', {}),
+    ('motos/listar', MotoView, 'listar', {}),
+    ('solicitudes/disponibles', SolicitudViajeView, 'disponibles', {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el tiempo de serialización por respuesta de los endpoints de transporte con '
+        'JSONRenderer de DRF y con MyJSONRenderer'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', type=int, help='Id del usuario; por defecto el que tiene más viajes')
+        parser.add_argument('--iteraciones', type=int, default=500)
+
+    def handle(self, *args, **options):
+        usuario = self._usuario(options['usuario'])
+        iteraciones = max(1, options['iteraciones'])
+        factory = APIRequestFactory()
+        renderers = [('DRF', JSONRenderer()), ('My', MyJSONRenderer())]
+
+        self.stdout.write(f"Usuario {usuario.id}; orjson {'disponible' if orjson else 'no instalado'}")
+        self.stdout.write(
+            f"{'Endpoint':<36}{'estado':>7}{'bytes':>9}{'DRF µs':>10}{'My µs':>10}{'x':>7}{'igual':>7}"
+        )
+        for name, view, action, params in ENDPOINTS:
+            request = factory.get(f'/{name}/', params)
+            force_authenticate(request, user=usuario)
+            response = view.as_view({'get': action})(request)
+            data = getattr(response, 'data', None)
+            if data is None:
+                self.stdout.write(f"{name:<36}{response.status_code:>7}  sin datos serializables")
+                continue
+
+            tiempos, salidas = [], []
+            for _, renderer in renderers:
+                salida = renderer.render(data)
+                inicio = time.perf_counter()
+                for _ in range(iteraciones):
+                    renderer.render(data)
+                tiempos.append((time.perf_counter() - inicio) / iteraciones * 1e6)
+                salidas.append(salida)
+
+            igual = json.loads(salidas[0]) == json.loads(salidas[1])
+            self.stdout.write(
+                f"{name:<36}{response.status_code:>7}{len(salidas[1]):>9}{tiempos[0]:>10.1f}"
+                f"{tiempos[1]:>10.1f}{tiempos[0] / tiempos[1]:>7.1f}{'sí' if igual else 'NO':>7}"
+            )
+
+    @staticmethod
+    def _usuario(usuario_id):
+        usuarios = User.objects.filter(is_active=True)
+        if usuario_id:
+            usuario = usuarios.filter(id=usuario_id).first()
+        else:
+            usuario = usuarios.annotate(
+                viajes=Count('viajes_como_pasajero', distinct=True) + Count('viajes_como_conductor', distinct=True)
+            ).order_by('-viajes', 'id').first()
+        if usuario is None:
+            raise CommandError('No hay usuario para medir')
+        return usuario
@@ -0,0 +1,62 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.my_startup import MyStartupProfiler
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de arranque de un worker en un intérprete nuevo: settings, ready() de cada app, '
+        'URL conf, handler ASGI, schema de drf_yasg e imports de módulos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=30, help='Cantidad de módulos a mostrar')
+        parser.add_argument(
+            '--orden', choices=['cumulative', 'self'], default='cumulative',
+            help='Ordenar los módulos por tiempo acumulado o propio'
+        )
+        parser.add_argument('--salida', help='Archivo CSV con el reporte completo (fases y módulos)')
+        parser.add_argument('--sin-schema', action='store_true', help='No generar el schema de drf_yasg')
+
+    def handle(self, *args, **options):
+        command = [sys.executable, '-X', 'importtime', '-m', 'core.my_startup']
+        if options['sin_schema']:
+            command.append('--sin-schema')
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'server.settings'))
+        result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        try:
+            report = json.loads(result.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise CommandError(f"El arranque falló:\n{result.stderr[-4000:]}")
+
+        modules = MyStartupProfiler.parse_importtime(result.stderr)
+        key = f"{options['orden']}_ms"
+        modules.sort(key=lambda module: module[key], reverse=True)
+
+        self.stdout.write(f"Arranque total: {report['total_ms']:.1f} ms ({len(modules)} módulos importados)")
+        self.stdout.write('')
+        self.stdout.write(f"{'Fase':<40}{'ms':>10}")
+        for phase in report['phases']:
+            self.stdout.write(f"{phase['name']:<40}{phase['ms']:>10.1f}")
+        self.stdout.write('')
+        self.stdout.write(f"{'Módulo':<60}{'propio ms':>12}{'acum. ms':>12}")
+        for module in modules[:options['top']]:
+            self.stdout.write(f"{module['name'][:59]:<60}{module['self_ms']:>12.1f}{module['cumulative_ms']:>12.1f}")
+
+        if options['salida']:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['tipo', 'nombre', 'propio_ms', 'acumulado_ms', 'profundidad'])
+                for phase in report['phases']:
+                    writer.writerow(['fase', phase['name'], f"{phase['ms']:.3f}", f"{phase['ms']:.3f}", 0])
+                for module in modules:
+                    writer.writerow([
+                        'modulo', module['name'], f"{module['self_ms']:.3f}",
+                        f"{module['cumulative_ms']:.3f}", module['depth']
+                    ])
+            self.stdout.write(f"Reporte completo en {options['salida']}")
@@ -0,0 +1,112 @@
+import threading
+import uuid
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from core.my_base import MY_DEBUG
+from security.models import Conductor, SolicitudViaje, User, Viaje
+from api.v1_0_0.transport.solicitud.service import SolicitudViajeService
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispara N aceptaciones simultáneas de una misma solicitud de viaje y verifica que '
+        'exactamente una gane y solo se cree un viaje. Usa un pasajero y conductores temporales '
+        'que se eliminan al final; fuera de MY_DEBUG requiere --confirmar.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conductores', type=int, default=10, help='Aceptaciones simultáneas')
+        parser.add_argument('--rondas', type=int, default=1)
+        parser.add_argument(
+            '--confirmar', action='store_true',
+            help='Permite ejecutarlo sin MY_DEBUG: escribe y borra registros en la base configurada'
+        )
+
+    def handle(self, *args, **options):
+        if not MY_DEBUG and not options['confirmar']:
+            raise CommandError('Sin MY_DEBUG se requiere --confirmar para escribir en esta base de datos')
+        if options['conductores'] < 2:
+            raise CommandError('Se necesitan al menos 2 conductores')
+
+        prefijo = f"prueba-{uuid.uuid4().hex[:8]}"
+        usuarios = []
+        fallidas = 0
+        try:
+            for indice in range(options['conductores'] + 1):
+                usuarios.append(self._usuario(prefijo, indice))
+            pasajero, conductores = usuarios[0], usuarios[1:]
+            for indice, usuario in enumerate(conductores):
+                Conductor.objects.create(
+                    user=usuario,
+                    telefono='0000000000',
+                    licencia_numero=f"{prefijo}-{indice}",
+                    licencia_vencimiento=date.today() + timedelta(days=365),
+                    estado='disponible',
+                )
+            for ronda in range(1, options['rondas'] + 1):
+                Conductor.objects.filter(user__in=conductores).update(estado='disponible')
+                resultados, viajes = self._ronda(pasajero, conductores)
+                ganadores = resultados.count(True)
+                if ganadores != 1 or viajes != 1:
+                    fallidas += 1
+                self.stdout.write(
+                    f"Ronda {ronda}: {len(resultados)} aceptaciones, {ganadores} ganador(es), "
+                    f"{viajes} viaje(s) creado(s)"
+                )
+        finally:
+            # Conductores, solicitudes y viajes de prueba se eliminan en cascada
+            User.objects.filter(id__in=[usuario.id for usuario in usuarios]).delete()
+
+        if fallidas:
+            raise CommandError(f'{fallidas} ronda(s) sin un único ganador')
+        self.stdout.write(self.style.SUCCESS('Exactamente una aceptación ganó en cada ronda'))
+
+    @staticmethod
+    def _usuario(prefijo, indice):
+        return User.objects.create_user(
+            username=f"{prefijo}-{indice}",
+            password=None,
+            email=f"{prefijo}-{indice}@example.com",
+            document=f"{prefijo[-8:]}{indice}",
+            first_name='Prueba',
+            last_name='Concurrencia',
+            is_active=False,
+        )
+
+    def _ronda(self, pasajero, usuarios):
+        ahora = timezone.now()
+        solicitud = SolicitudViaje.objects.create(
+            pasajero=pasajero,
+            origen_lat=0, origen_lng=0, origen_direccion='Prueba de concurrencia',
+            destino_lat=0, destino_lng=0, destino_direccion='Prueba de concurrencia',
+            precio_solicitado=1, estado='pendiente',
+            fecha_expiracion=ahora + timedelta(minutes=5),
+        )
+        barrera = threading.Barrier(len(usuarios))
+        resultados = []
+
+        def aceptar(usuario):
+            try:
+                barrera.wait()
+                with transaction.atomic():
+                    resultado = SolicitudViajeService().aceptar_solicitud(solicitud.id, usuario)
+                    if not resultado.is_success:
+                        transaction.set_rollback(True)
+                resultados.append(resultado.is_success)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=aceptar, args=(usuario,)) for usuario in usuarios]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        # Cualquier viaje creado por un perdedor también cuenta
+        viajes = Viaje.objects.filter(pasajero=pasajero)
+        total = viajes.count()
+        viajes.delete()
+        solicitud.delete()
+        return resultados, total
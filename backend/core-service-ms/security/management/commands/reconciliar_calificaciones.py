@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api.v1_0_0.transport.calificacion.service import CalificacionService
+from security.models import Calificacion, Conductor, ResumenCalificacion
+
+CAMPOS_RESUMEN = [
+    'suma', 'total', 'estrellas_1', 'estrellas_2', 'estrellas_3', 'estrellas_4', 'estrellas_5',
+    'decaida_suma', 'decaida_peso', 'decaida_fecha',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye los agregados de calificaciones (ResumenCalificacion) y el promedio de los '
+        'conductores a partir de todas las calificaciones, en una sola pasada'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ahora = timezone.now()
+        resumenes = {}
+
+        with transaction.atomic():
+            # Los resúmenes quedan bloqueados antes de leer las calificaciones: crear_calificacion
+            # espera al final de la reconstrucción en vez de sumar una calificación que luego se pisa
+            for _ in ResumenCalificacion.objects.select_for_update().values_list('id', flat=True).iterator(
+                    chunk_size=batch_size):
+                pass
+
+            # Una pasada ordenada por fecha: el puntaje reciente se acumula igual que al calificar
+            filas = Calificacion.objects.order_by('fecha_calificacion', 'id').values_list(
+                'calificado_id', 'puntuacion', 'fecha_calificacion'
+            )
+            for calificado_id, puntuacion, fecha in filas.iterator(chunk_size=batch_size):
+                resumen = resumenes.get(calificado_id)
+                if resumen is None:
+                    resumen = resumenes[calificado_id] = ResumenCalificacion(usuario_id=calificado_id)
+                factor = CalificacionService.factor_decaimiento(resumen.decaida_fecha, fecha)
+                resumen.suma += puntuacion
+                resumen.total += 1
+                setattr(resumen, f'estrellas_{puntuacion}', getattr(resumen, f'estrellas_{puntuacion}') + 1)
+                resumen.decaida_suma = resumen.decaida_suma * factor + puntuacion
+                resumen.decaida_peso = resumen.decaida_peso * factor + 1
+                resumen.decaida_fecha = fecha
+
+            # Todo a cero y luego los recalculados: quien ya no tiene calificaciones queda en cero
+            ResumenCalificacion.objects.update(
+                suma=0, total=0, estrellas_1=0, estrellas_2=0, estrellas_3=0, estrellas_4=0,
+                estrellas_5=0, decaida_suma=0, decaida_peso=0, decaida_fecha=None, updated_at=ahora
+            )
+            ResumenCalificacion.objects.bulk_create(
+                list(resumenes.values()),
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['usuario'],
+                update_fields=CAMPOS_RESUMEN + ['updated_at']
+            )
+
+            conductores = []
+            for conductor in Conductor.objects.only('id', 'user_id', 'calificacion_promedio').iterator(
+                    chunk_size=batch_size):
+                resumen = resumenes.get(conductor.user_id)
+                promedio = CalificacionService.promedio_conductor(
+                    resumen.suma if resumen else 0, resumen.total if resumen else 0
+                )
+                if conductor.calificacion_promedio != promedio:
+                    conductor.calificacion_promedio = promedio
+                    conductores.append(conductor)
+            Conductor.objects.bulk_update(conductores, ['calificacion_promedio'], batch_size=batch_size)
+
+        self.stdout.write(
+            f"Resúmenes reconstruidos: {len(resumenes)}; conductores actualizados: {len(conductores)}"
+        )
@@ -7,12 +7,16 @@ from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator, EmailValidator
 from django.db import models
 from django.db.models.query_utils import Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from security.context_processors import thread_context
 from helpers.functions_helper import HelperFunctions
 from helpers.choices_helper import HelperChoices
+from helpers.menu_helper import HelperMenu
+from helpers.permission_helper import HelperPermission
 from core.my_model import MyModel
 
 
@@ -54,16 +58,13 @@ class Company(MyModel):
     @classmethod
     def load_compnay(cls, id=1):
         try:
-            company_cache = cls.cache(id, 'id')
-            first = None
-            if company_cache.has_key():
-                first = company_cache.get_model_object()
-            if not first:
+            try:
+                return cls.objects.cached_get(id=id)
+            except cls.DoesNotExist:
                 first = cls.objects.first()
                 if first is None:
                     raise NameError("No existen registro de la empresa.")
-                company_cache.set_model_object(first)
-            return first
+                return first
         except Exception as ex:
             raise NameError(f"Error al obtener datos: {ex}")
 
@@ -633,6 +634,22 @@ class ModuleTable(MyModel):
         super(ModuleTable, self).save(*args, **kwargs)
 
 
+class FixtureLoad(MyModel):
+    """
+    Última carga de cada archivo de security/fixtures (ver el comando cargar_fixtures)
+    """
+    name = models.CharField(max_length=150, unique=True, verbose_name='Archivo')
+    checksum = models.CharField(max_length=64, verbose_name='SHA-256 del contenido')
+    rows = models.PositiveIntegerField(default=0, verbose_name='Registros cargados')
+
+    class Meta:
+        verbose_name = u"Carga de datos iniciales"
+        verbose_name_plural = u"Cargas de datos iniciales"
+
+    def __str__(self):
+        return f"{self.name} ({self.checksum[:12]})"
+
+
 class User(AbstractUser, MyModel):
     groups = None
     user_permissions = None
@@ -892,103 +909,10 @@ class Menu(MyModel):
         - Ítems del menú fijo: pueden ser categorías (con hijos) o sueltos.
         - Ítems extras (ProfileAllowed): siempre sueltos.
         - Respeta ProfileDenied para todos.
+        Se compila en un número fijo de consultas y queda en caché por (menú, perfil)
+        hasta que cambie algún ítem, permiso o módulo del que depende.
         """
-
-        structure = []
-
-        # ---------- 1. Ítems del menú fijo (categorías o sueltos) ----------
-        qs_items = self.items.filter(
-            parent=None,
-            is_active=True,
-            is_current=True,
-            is_visible=True
-        ).select_related('menu').order_by('order')
-
-        for item in qs_items:
-            # negación aplicada dentro de can_access
-            if profile and not item.can_access(profile):
-                continue
-            node = self._build_menu_item_data(item, profile)
-            structure.append(node)
-
-        # ---------- 2. Ítems extras por ProfileAllowed (sueltos) ----------
-        if profile:
-            extras = (
-                ProfileAllowed.objects
-                .filter(profile=profile, is_current=True)
-                .select_related('module')
-                .prefetch_related('permissions')
-                .order_by('module__name')
-            )
-            for pa in extras:
-                mod = pa.module
-                # Módulo vigente
-                if not (mod.is_current and mod.is_active):
-                    continue
-                # No duplicar si ya está en el menú fijo
-                if self.items.filter(module=mod, is_current=True).exists():
-                    continue
-                # Negación explícita
-                denied = ProfileDenied.objects.filter(
-                    profile=profile,
-                    module=mod,
-                    permission__code='can_access',
-                    is_current=True
-                ).filter(
-                    Q(start_date__lte=date.today()) &
-                    Q(Q(end_date__isnull=True) | Q(end_date__gte=date.today()))
-                ).exists()
-                if denied:
-                    continue
-
-                # Nodo suelto
-                node = {
-                    'id': mod.pk,
-                    'name': mod.name,
-                    'type': 'MODULE',
-                    'path': reverse(mod.path),
-                    'target': '_self',
-                    'is_external': False,
-                    'children': []
-                }
-                structure.append(node)
-
-        return structure
-
-    def _build_menu_item_data(self, menu_item, profile=None):
-        """
-        Construye los datos de un elemento del menú recursivamente
-        """
-        item_data = {
-            'id': menu_item.id,
-            'name': menu_item.name,
-            'type': menu_item.type,
-            # 'icon': menu_item.icon,
-            'path': menu_item.path if not menu_item.module else reverse(f'{menu_item.module.path}'),
-            'target': menu_item.target,
-            'is_external': menu_item.is_external,
-            'children': []
-        }
-
-        # Obtener hijos si los tiene
-        if menu_item.has_children:
-            children_items = self.items.filter(
-                parent=menu_item,
-                is_active=True,
-                is_current=True,
-                is_visible=True
-            ).select_related('menu').order_by('order')
-
-            for child_item in children_items:
-
-                # Verificar permisos
-                if profile and not child_item.can_access(profile):
-                    continue
-
-                child_data = self._build_menu_item_data(child_item, profile)
-                item_data['children'].append(child_data)
-
-        return item_data
+        return HelperMenu.get_structure(self, profile)
 
     def handle_menu_permission(self):
         # from tasks.threaded import handle_menu_permission_thread
@@ -1127,59 +1051,16 @@ class MenuItem(MyModel):
             is_visible=True
         ).order_by('order', 'name')
 
-    def can_access(self, profile):
-        # 0. Superuser
-        if profile.user.is_superuser:
-            return True
-
-        # 1. Básicos
-        if not (self.is_active and self.is_current and self.is_visible):
-            return False
-
-        # 2. Sin módulo → no hay qué negar/otorgar
-        if not self.module:
-            return True
-
-        # 3. Negación explícita
-        denied = ProfileDenied.objects.filter(
-            profile=profile,
-            module=self.module,
-            permission__code='can_access',
-            is_current=True
-        ).filter(
-            Q(start_date__lte=date.today()) &
-            Q(Q(end_date__isnull=True) | Q(end_date__gte=date.today()))
-        ).exists()
-        if denied:
-            return False
-
-        # 4. ¿El módulo requiere can_access?
-        if not self.module.permissions.filter(code='can_access').exists():
-            return True  # el módulo no pide nada
-
-        # 5. Acceso vía ProfileAllowed
-        if profile.alloweds.filter(
-                module=self.module,
-                permissions__code='can_access',
-                is_current=True
-        ).exists():
-            return True
-
-        # 6. Acceso vía rol (MenuItem.permissions o Role→Permission)
-        #    (si en tu proyecto los permisos del rol van en MenuItem.permissions)
-        if self.permissions.filter(code='can_access').exists():
-            return True
-
-        # 7. Acceso vía grupo Django (por si usás la tabla nativa)
-        #    (opcional, solo si migraste Group → Role y usas auth.permissions)
-        # if profile.user.user_permissions.filter(
-        #         codename='can_access'
-        # ).filter(
-        #     Q(content_type__model='module') | Q(module=self.module)
-        # ).exists():
-        #     return True
-
-        return False
+    def can_access(self, profile, evaluator=None):
+        """
+        Orden de evaluación: superusuario, básicos (activo/vigente/visible), sin módulo,
+        negación explícita (ProfileDenied vigente), módulo sin can_access, ProfileAllowed
+        y por último el permiso del rol en MenuItem.permissions.
+        Para varios ítems, pasar el mismo evaluator (HelperPermission.evaluator) evita
+        volver a consultar la base por cada uno.
+        """
+        evaluator = evaluator or HelperPermission.evaluator(profile, menu_id=self.menu_id)
+        return evaluator.can_access(self)
 
     @staticmethod
     def flexbox_query(search, extra=None, limit=25, exclude=None):
@@ -1218,6 +1099,48 @@ class MenuItem(MyModel):
         self.full_clean()
         super(MenuItem, self).save(*args, **kwargs)
 
+
+def _menu_scope(instance):
+    """Alcance de versión de HelperMenu afectado por un cambio en la instancia"""
+    if isinstance(instance, Menu):
+        return f"menu:{instance.pk}"
+    if isinstance(instance, MenuItem):
+        return f"menu:{instance.menu_id}"
+    if isinstance(instance, (ProfileAllowed, ProfileDenied)):
+        return f"profile:{instance.profile_id}"
+    # Módulos y permisos afectan a cualquier menú
+    return HelperMenu.GLOBAL
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=ProfileAllowed)
+@receiver(post_delete, sender=ProfileAllowed)
+@receiver(post_save, sender=ProfileDenied)
+@receiver(post_delete, sender=ProfileDenied)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_menu_structure(sender, instance, **kwargs):
+    """Invalida las estructuras de menú compiladas que dependen de la instancia"""
+    if not kwargs.get('raw'):
+        HelperMenu.bump_version_on_commit(_menu_scope(instance), using=kwargs.get('using'))
+
+
+@receiver(m2m_changed, sender=MenuItem.permissions.through)
+@receiver(m2m_changed, sender=ProfileAllowed.permissions.through)
+@receiver(m2m_changed, sender=ProfileDenied.permissions.through)
+@receiver(m2m_changed, sender=Module.permissions.through)
+def invalidate_menu_structure_permissions(sender, instance, action, reverse, **kwargs):
+    """Invalida las estructuras de menú al cambiar los permisos asignados"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        scope = HelperMenu.GLOBAL if reverse else _menu_scope(instance)
+        HelperMenu.bump_version_on_commit(scope, using=kwargs.get('using'))
+
+
 class Carrera(MyModel):
     nombre = models.CharField(verbose_name='Nombre', max_length=100, unique=True, error_messages={'unique': 'El nombre ya existe'})
     nombre_mostrar = models.CharField(verbose_name='Nombre a mostrar', max_length=80)
@@ -1314,6 +1237,9 @@ class Conductor(MyModel):
         verbose_name = 'Conductor'
         verbose_name_plural = 'Conductores'
         ordering = ['-calificacion_promedio']
+        indexes = [
+            models.Index(fields=['estado', 'ubicacion_actual_lat', 'ubicacion_actual_lng']),
+        ]
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.licencia_numero}"
@@ -1438,6 +1364,8 @@ class Viaje(MyModel):
             models.Index(fields=['estado', 'fecha_solicitud']),
             models.Index(fields=['pasajero', 'estado']),
             models.Index(fields=['conductor', 'estado']),
+            models.Index(fields=['pasajero', '-fecha_solicitud', '-id']),
+            models.Index(fields=['conductor', '-fecha_solicitud', '-id']),
         ]
 
     def __str__(self):
@@ -1493,6 +1421,14 @@ class SolicitudViaje(MyModel):
         default='pendiente',
         verbose_name='Estado'
     )
+    viaje = models.OneToOneField(
+        Viaje,
+        on_delete=models.SET_NULL,
+        related_name='solicitud',
+        null=True,
+        blank=True,
+        verbose_name='Viaje'
+    )
     fecha_expiracion = models.DateTimeField(verbose_name='Fecha de expiración')
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
 
@@ -1503,6 +1439,7 @@ class SolicitudViaje(MyModel):
         indexes = [
             models.Index(fields=['estado', 'fecha_creacion']),
             models.Index(fields=['pasajero', 'estado']),
+            models.Index(fields=['estado', 'fecha_expiracion']),
         ]
 
     def __str__(self):
@@ -1541,6 +1478,53 @@ class Calificacion(MyModel):
         verbose_name_plural = 'Calificaciones'
         unique_together = ('viaje', 'calificador')
         ordering = ['-fecha_calificacion']
+        indexes = [
+            models.Index(fields=['calificador', '-fecha_calificacion', '-id']),
+            models.Index(fields=['calificado', '-fecha_calificacion', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.calificador.get_full_name()} → {self.calificado.get_full_name()}: {self.puntuacion}/5"
+
+
+class ResumenCalificacion(MyModel):
+    """
+    Agregados de las calificaciones recibidas por un usuario, mantenidos al calificar
+    (CalificacionService) y reconstruibles con el comando reconciliar_calificaciones.
+    El puntaje reciente pondera cada calificación con decaimiento exponencial por antigüedad.
+    """
+    usuario = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='resumen_calificaciones',
+        verbose_name='Usuario'
+    )
+    suma = models.PositiveIntegerField(default=0, verbose_name='Suma de puntuaciones')
+    total = models.PositiveIntegerField(default=0, verbose_name='Total de calificaciones')
+    estrellas_1 = models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 1 estrella')
+    estrellas_2 = models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 2 estrellas')
+    estrellas_3 = models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 3 estrellas')
+    estrellas_4 = models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 4 estrellas')
+    estrellas_5 = models.PositiveIntegerField(default=0, verbose_name='Calificaciones de 5 estrellas')
+    decaida_suma = models.FloatField(default=0, verbose_name='Suma ponderada por antigüedad')
+    decaida_peso = models.FloatField(default=0, verbose_name='Peso total por antigüedad')
+    decaida_fecha = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de referencia de los pesos')
+
+    class Meta:
+        verbose_name = 'Resumen de calificaciones'
+        verbose_name_plural = 'Resúmenes de calificaciones'
 
     def __str__(self):
-        return f"{self.calificador.get_full_name()} → {self.calificado.get_full_name()}: {self.puntuacion}/5"
\ No newline at end of file
+        return f"{self.usuario_id}: {self.promedio}/5 ({self.total})"
+
+    @property
+    def promedio(self):
+        return round(self.suma / self.total, 2) if self.total else 0
+
+    @property
+    def puntaje_reciente(self):
+        return round(self.decaida_suma / self.decaida_peso, 2) if self.decaida_peso else 0
+
+    @property
+    def estrellas(self):
+        return {str(estrella): getattr(self, f"estrellas_{estrella}") for estrella in range(1, 6)}
@@ -2,6 +2,9 @@
 ASGI config for core-service-ms project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+This is the entry point in production (gunicorn with uvicorn workers) so the
+Server-Sent Events streams in api.v1_0_0.transport.eventos run on the event loop
+instead of holding a sync worker per connected client.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -24,6 +24,10 @@ ls -la /app/security/migrations/ || echo "Advertencia: directorio de migraciones
 echo "Ejecutando migraciones..."
 python manage.py migrate --noinput || echo "Error en migraciones, continuando..."
 
+# Cargar datos iniciales (omite los fixtures que no cambiaron)
+echo "Cargando datos iniciales..."
+python manage.py cargar_fixtures || echo "Error cargando datos iniciales, continuando..."
+
 # Recolectar archivos estáticos
 echo "Recolectando archivos estáticos..."
 python manage.py collectstatic --noinput || true
@@ -31,7 +35,8 @@ python manage.py collectstatic --noinput || true
 # Verificar que gunicorn está instalado
 echo "Verificando gunicorn..."
 which gunicorn || pip install gunicorn==21.2.0
+python -c "import uvicorn" || pip install uvicorn==0.30.6
 
-# Iniciar el servidor con Gunicorn
+# Iniciar el servidor con Gunicorn (workers ASGI para los canales de eventos)
 echo "Iniciando servidor Gunicorn..."
-exec gunicorn server.wsgi:application --bind 0.0.0.0:${PORT:-8000} --workers 2 --timeout 120
+exec gunicorn server.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:${PORT:-8000} --workers 2 --timeout 120